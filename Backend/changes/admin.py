@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import ChangeRecord
+
+
+@admin.register(ChangeRecord)
+class ChangeRecordAdmin(admin.ModelAdmin):
+    """Read-only: the outbox is written by changes.outbox and pruned by prune_changes"""
+    list_display = ['id', 'model', 'object_id', 'operation', 'transaction_id', 'changed_at']
+    list_filter = ['model', 'operation']
+    search_fields = ['object_id']
+    ordering = ['-id']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from changes.models import ChangeRecord
+
+
+class Command(BaseCommand):
+    help = 'Borra los registros de cambios más antiguos que --days días'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ChangeRecord.objects.filter(changed_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Registros de cambios borrados: {deleted}'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changerecord',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='changerecord',
+            index=models.Index(fields=['transaction_id', 'id'], name='change_records_feed_idx'),
+        ),
+    ]
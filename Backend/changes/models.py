@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class ChangeRecord(models.Model):
+    """
+    Append-only outbox of changes to sales, sale items, products and customers.
+    The id is the cursor clients pass back as ?since= to /api/changes/.
+    transaction_id is the writing transaction on PostgreSQL (0 elsewhere); the
+    feed is ordered by (transaction_id, id), see changes.views.
+    """
+    OPERATIONS = [
+        ('create', 'Creación'),
+        ('update', 'Actualización'),
+        ('delete', 'Eliminación'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATIONS)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    transaction_id = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.id}: {self.operation} {self.model} {self.object_id}"
+    
+    class Meta:
+        db_table = 'change_records'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['transaction_id', 'id'], name='change_records_feed_idx'),
+        ]
@@ -0,0 +1,50 @@
+"""
+Writing to the change outbox (ChangeRecord).
+
+Model saves and deletes are recorded by signals (see signals.py). Code that
+writes with update() or bulk_create(), which send no signals, calls
+record_changes() itself. Either way the record is inserted on the same
+connection, so it commits or rolls back together with the change as long as
+both run in one transaction: post_save is sent after the row is written, so a
+save() in autocommit must be wrapped in transaction.atomic() (deletes always
+run in one).
+"""
+from django.db import connection
+from django.utils import timezone
+from .models import ChangeRecord
+
+TRACKED_MODELS = ['sale', 'saleitem', 'product', 'customer']
+
+# executemany() instead of bulk_create(): bulk writes (imports, bulk sales)
+# record thousands of ids and only these values vary
+INSERT_SQL = (
+    'INSERT INTO change_records (model, object_id, operation, changed_at, transaction_id) '
+    'VALUES (%s, %s, %s, %s, %s)'
+)
+# On PostgreSQL the feed orders by the id of the writing transaction
+POSTGRESQL_INSERT_SQL = (
+    'INSERT INTO change_records (model, object_id, operation, changed_at, transaction_id) '
+    'VALUES (%s, %s, %s, %s, txid_current())'
+)
+
+
+def finished_transactions_bound():
+    """Every transaction with a lower txid has finished (PostgreSQL only)"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def record_changes(model, object_ids, operation='update'):
+    """Append one record per id; model is a model class or its model_name"""
+    model_name = model if isinstance(model, str) else model._meta.model_name
+    changed_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    if connection.vendor == 'postgresql':
+        sql = POSTGRESQL_INSERT_SQL
+        rows = [(model_name, object_id, operation, changed_at) for object_id in object_ids if object_id is not None]
+    else:
+        sql = INSERT_SQL
+        rows = [(model_name, object_id, operation, changed_at, 0) for object_id in object_ids if object_id is not None]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from sales.models import Sale, SaleItem
+from products.models import Product
+from customers.models import Customer
+from .outbox import record_changes
+
+
+def record_save(sender, instance, created, **kwargs):
+    record_changes(sender, [instance.pk], 'create' if created else 'update')
+
+
+def record_delete(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], 'delete')
+
+
+for model in (Sale, SaleItem, Product, Customer):
+    post_save.connect(record_save, sender=model, dispatch_uid=f'changes_{model.__name__}_save')
+    post_delete.connect(record_delete, sender=model, dispatch_uid=f'changes_{model.__name__}_delete')
@@ -0,0 +1,105 @@
+import io
+import threading
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from customers.models import Customer
+from .models import ChangeRecord
+from .outbox import record_changes
+
+User = get_user_model()
+
+
+# TransactionTestCase: on PostgreSQL the feed only serves finished transactions,
+# and the transaction TestCase wraps each test in never finishes
+class ChangeFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='feed', password='x'))
+
+    def create_customer(self, name):
+        response = self.client.post('/api/customers/', {'name': name, 'document_number': name}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def feed(self, **params):
+        response = self.client.get('/api/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_follow_write_order(self):
+        customer_ids = [self.create_customer(f'C{i}') for i in range(5)]
+        seen = []
+        cursor = 0
+        while True:
+            page = self.feed(since=cursor, limit=2, models='customer')
+            seen += [change['object_id'] for change in page['changes']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, customer_ids)
+        self.assertEqual(self.feed(since=cursor)['changes'], [])
+
+    def test_delete_is_recorded(self):
+        customer_id = self.create_customer('Borrado')
+        cursor = self.feed()['cursor']
+        self.assertEqual(self.client.delete(f'/api/customers/{customer_id}/').status_code, 204)
+        changes = self.feed(since=cursor)['changes']
+        self.assertEqual(
+            [(change['model'], change['object_id'], change['op']) for change in changes],
+            [('customer', customer_id, 'delete')]
+        )
+
+    def test_pruned_cursor_is_gone(self):
+        self.create_customer('Viejo')
+        cursor = self.feed()['cursor']
+        call_command('prune_changes', days=0, stdout=io.StringIO())
+        self.assertEqual(self.client.get('/api/changes/', {'since': cursor}).status_code, 410)
+        # Resync from zero works again
+        self.assertEqual(self.feed(since=0)['changes'], [])
+
+    def test_customer_write_and_record_commit_together(self):
+        with mock.patch('changes.signals.record_changes', side_effect=DatabaseError('outbox')):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/api/customers/', {'name': 'Perdido', 'document_number': 'X1'}, format='json')
+        self.assertFalse(Customer.objects.filter(name='Perdido').exists())
+
+
+class ChangeFeedVisibilityTests(TransactionTestCase):
+    """Records of a transaction still running must not be stepped over by the cursor"""
+
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('En SQLite los ids se hacen visibles en orden (un solo escritor)')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='feed', password='x'))
+
+    def test_newer_transaction_waits_for_older_one(self):
+        recorded = threading.Event()
+        release = threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    record_changes('customer', [1], 'create')
+                    recorded.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=slow_writer)
+        thread.start()
+        self.assertTrue(recorded.wait(10))
+        # Committed after the slow writer started: higher txid, but not served yet
+        record_changes('customer', [2], 'create')
+        page = self.client.get('/api/changes/').data
+        self.assertEqual(page['changes'], [])
+
+        release.set()
+        thread.join()
+        page = self.client.get('/api/changes/', {'since': page['cursor']}).data
+        self.assertEqual([change['object_id'] for change in page['changes']], [1, 2])
+        self.assertEqual(ChangeRecord.objects.count(), 2)
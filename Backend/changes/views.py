@@ -0,0 +1,78 @@
+"""
+Change feed (GET /api/changes/).
+
+Ids are allocated at insert time but become visible at commit, so a plain
+"id > since" cursor could step over the lower id of a transaction that was
+still running and never see it. The feed is ordered by (transaction_id, id):
+
+- PostgreSQL: records carry txid_current() and only transactions older than
+  the snapshot's xmin (all of them finished) are served. Any transaction still
+  running has a txid >= xmin, so its records sort after every served cursor.
+- SQLite: one writer at a time holds the write lock until commit, so ids
+  become visible in order; transaction_id is always 0 and the order is by id.
+
+The cursor is still the id of the last record served; its transaction_id is
+looked up. A cursor whose record was pruned (prune_changes) gets 410 and the
+client must resync from a full snapshot (e.g. /api/products/catalog/).
+"""
+from django.db import connection
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .models import ChangeRecord
+from .outbox import TRACKED_MODELS, finished_transactions_bound
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def change_feed(request):
+    """Changes after the ?since= cursor, oldest first"""
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        return Response(
+            {'error': 'since y limit deben ser números enteros'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    records = ChangeRecord.objects.all()
+    if since > 0:
+        since_transaction = ChangeRecord.objects.filter(pk=since).values_list('transaction_id', flat=True).first()
+        if since_transaction is None:
+            return Response(
+                {'error': 'El cursor ya no existe (registros depurados); vuelva a sincronizar desde cero con since=0'},
+                status=status.HTTP_410_GONE
+            )
+        records = records.filter(
+            Q(transaction_id__gt=since_transaction) | Q(transaction_id=since_transaction, id__gt=since)
+        )
+    if connection.vendor == 'postgresql':
+        records = records.filter(transaction_id__lt=finished_transactions_bound())
+    models = request.query_params.get('models')
+    if models:
+        names = [name.strip() for name in models.split(',') if name.strip()]
+        invalid = [name for name in names if name not in TRACKED_MODELS]
+        if invalid:
+            return Response(
+                {'error': f'Modelos no válidos: {", ".join(invalid)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        records = records.filter(model__in=names)
+
+    rows = list(records.order_by('transaction_id', 'id').values_list('id', 'model', 'object_id', 'operation', 'changed_at')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return Response({
+        'changes': [
+            {'id': row[0], 'model': row[1], 'object_id': row[2], 'op': row[3], 'at': row[4]}
+            for row in rows
+        ],
+        'cursor': rows[-1][0] if rows else since,
+        'has_more': has_more,
+    })
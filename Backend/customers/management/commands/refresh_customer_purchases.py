@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from customers.purchases import refresh_customer_purchases
+
+
+class Command(BaseCommand):
+    help = 'Recalcula total_purchases, purchase_count y last_purchase_at de los clientes a partir de las ventas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('customer_ids', nargs='*', type=int, help='Clientes a recalcular (todos si se omite)')
+
+    def handle(self, *args, **options):
+        updated = refresh_customer_purchases(options['customer_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Totales de compra recalculados: {updated} clientes'))
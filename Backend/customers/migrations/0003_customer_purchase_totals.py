@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:20
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_purchase_totals(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    Sale = apps.get_model('sales', 'Sale')
+    sales = Sale.objects.filter(customer=OuterRef('pk')).exclude(status='cancelled').order_by().values('customer')
+    Customer.objects.update(
+        total_purchases=Coalesce(
+            Subquery(sales.annotate(total=Sum('total_amount')).values('total')),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2)
+        ),
+        purchase_count=Coalesce(Subquery(sales.annotate(count=Count('pk')).values('count')), Value(0)),
+        last_purchase_at=Subquery(sales.annotate(latest=Max('created_at')).values('latest'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_initial'),
+        ('sales', '0006_sale_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_purchase_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='purchase_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_purchases',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['total_purchases'], name='customers_total_purch_idx'),
+        ),
+        migrations.RunPython(backfill_purchase_totals, migrations.RunPython.noop),
+    ]
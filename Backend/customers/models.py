@@ -24,6 +24,10 @@ class Customer(models.Model):
     postal_code = models.CharField(max_length=20, blank=True)
     notes = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    # Non-cancelled sales, kept up to date by the sales paths (customers.purchases)
+    total_purchases = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchase_count = models.IntegerField(default=0)
+    last_purchase_at = models.DateTimeField(null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -31,12 +35,8 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
     
-    @property
-    def total_purchases(self):
-        from sales.models import Sale
-        return Sale.objects.filter(customer=self).aggregate(
-            total=models.Sum('total_amount')
-        )['total'] or 0
-    
     class Meta:
         db_table = 'customers'
+        indexes = [
+            models.Index(fields=['total_purchases'], name='customers_total_purch_idx'),
+        ]
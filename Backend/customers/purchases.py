@@ -0,0 +1,62 @@
+"""
+Maintenance of the denormalized purchase totals on Customer.
+
+New sales add to the totals with a single F() update. Cancelling, editing or
+deleting a sale recomputes the affected customers from their sales, and
+refresh_customer_purchases() without arguments repairs every customer.
+"""
+from decimal import Decimal
+from django.db.models import (
+    Case, When, Value, F, Sum, Count, Max, OuterRef, Subquery,
+    DecimalField, IntegerField, DateTimeField
+)
+from django.db.models.functions import Coalesce, Greatest
+from changes.outbox import record_changes
+from sales.models import Sale
+from .models import Customer
+
+
+def add_purchases(purchases):
+    """
+    Add new sales to the totals with one UPDATE.
+    purchases: {customer_id: (amount, count, last_purchase_at)}
+    """
+    purchases = {customer_id: value for customer_id, value in purchases.items() if customer_id}
+    if not purchases:
+        return 0
+
+    def per_customer(position, output_field):
+        return Case(
+            *[When(pk=customer_id, then=Value(value[position])) for customer_id, value in purchases.items()],
+            output_field=output_field
+        )
+
+    latest = per_customer(2, DateTimeField())
+    record_changes(Customer, purchases)
+    return Customer.objects.filter(pk__in=list(purchases)).update(
+        total_purchases=F('total_purchases') + per_customer(0, DecimalField(max_digits=14, decimal_places=2)),
+        purchase_count=F('purchase_count') + per_customer(1, IntegerField()),
+        last_purchase_at=Greatest(Coalesce(F('last_purchase_at'), latest), latest)
+    )
+
+
+def add_sale_purchase(sale):
+    add_purchases({sale.customer_id: (sale.total_amount, 1, sale.created_at)})
+
+
+def refresh_customer_purchases(customer_ids=None):
+    """Recompute the totals from the sales table (all customers when customer_ids is None)"""
+    sales = Sale.objects.filter(customer=OuterRef('pk')).exclude(status='cancelled').order_by().values('customer')
+    customers = Customer.objects.all()
+    if customer_ids is not None:
+        customers = customers.filter(pk__in=[customer_id for customer_id in customer_ids if customer_id])
+    record_changes(Customer, customers.values_list('pk', flat=True))
+    return customers.update(
+        total_purchases=Coalesce(
+            Subquery(sales.annotate(total=Sum('total_amount')).values('total')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+        purchase_count=Coalesce(Subquery(sales.annotate(count=Count('pk')).values('count')), Value(0)),
+        last_purchase_at=Subquery(sales.annotate(latest=Max('created_at')).values('latest'))
+    )
@@ -10,9 +10,10 @@ class CustomerSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'customer_type', 'document_number', 'email',
             'phone', 'address', 'city', 'state', 'postal_code',
-            'notes', 'is_active', 'total_purchases', 'created_at', 'updated_at'
+            'notes', 'is_active', 'total_purchases', 'purchase_count', 'last_purchase_at',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'purchase_count', 'last_purchase_at', 'created_at', 'updated_at']
 
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
@@ -43,4 +44,7 @@ class CustomerListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Customer
-        fields = ['id', 'name', 'customer_type', 'email', 'phone', 'total_purchases', 'is_active', 'created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'customer_type', 'email', 'phone', 'total_purchases', 'purchase_count',
+            'last_purchase_at', 'is_active', 'created_at', 'updated_at'
+        ]
@@ -2,10 +2,15 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.db.models import Q
+from reports.conditional import conditional_action
 from .models import Customer
 from .serializers import CustomerSerializer, CustomerCreateUpdateSerializer, CustomerListSerializer
 
+# Allowed values for ?ordering= (prefix with "-" for descending)
+ORDERING_FIELDS = ['name', 'created_at', 'total_purchases', 'purchase_count', 'last_purchase_at']
+
 
 class CustomerViewSet(viewsets.ModelViewSet):
     """
@@ -41,10 +46,21 @@ class CustomerViewSet(viewsets.ModelViewSet):
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
         
+        ordering = self.request.query_params.get('ordering', None)
+        if ordering and ordering.lstrip('-') in ORDERING_FIELDS:
+            return queryset.order_by(ordering, '-id')
+        
         return queryset.order_by('-created_at')
     
+    # Customer writes are tracked by the change outbox (changes.signals): the row
+    # and its ChangeRecord must commit in the same transaction
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        with transaction.atomic():
+            serializer.save(created_by=self.request.user)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
     
     def create(self, request, *args, **kwargs):
         """Override create to return full customer data with dates"""
@@ -75,11 +91,13 @@ class CustomerViewSet(viewsets.ModelViewSet):
         """Toggle customer active status"""
         customer = self.get_object()
         customer.is_active = not customer.is_active
-        customer.save()
+        with transaction.atomic():
+            customer.save()
         serializer = self.get_serializer(customer)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @conditional_action(Customer)
     def statistics(self, request):
         """Get customer statistics"""
         total_customers = Customer.objects.count()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type', 'transaction_date'], name='transactions_type_date_idx'),
+        ),
+    ]
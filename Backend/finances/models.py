@@ -55,6 +55,9 @@ class Transaction(models.Model):
     class Meta:
         db_table = 'transactions'
         ordering = ['-transaction_date', '-created_at']
+        indexes = [
+            models.Index(fields=['transaction_type', 'transaction_date'], name='transactions_type_date_idx'),
+        ]
 
 
 class Budget(models.Model):
@@ -6,6 +6,7 @@ from django.db.models import Sum, Count
 from django.db.models.query import QuerySet
 from django.utils import timezone
 from datetime import datetime, timedelta
+from reports.conditional import conditional_action
 from .models import Transaction, ExpenseCategory, Budget
 from .serializers import (
     TransactionSerializer, TransactionCreateUpdateSerializer, TransactionListSerializer,
@@ -56,6 +57,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         serializer.save(created_by=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @conditional_action(Transaction)
     def statistics(self, request):
         """Get financial statistics"""
         today = timezone.now().date()
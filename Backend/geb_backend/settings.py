@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
     'sales',
     'finances',
     'reports',
+    'changes',
     'testing_pages',
     'pricing_analysis',
     'marketing_analytics',
@@ -99,6 +101,30 @@ DATABASES = {
 }
 
 
+# Cache
+# Con REDIS_URL el caché se comparte entre workers (necesario para invalidar reportes)
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif DEBUG:
+    # Solo desarrollo: un único proceso (runserver), el caché local basta
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    # Con varios workers un LocMemCache por proceso nunca recibe las invalidaciones
+    # de los demás y serviría reportes obsoletos durante horas
+    raise ImproperlyConfigured('REDIS_URL es obligatorio con DEBUG=False (caché compartido de reportes)')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,6 +166,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Hilos del pool local que genera reportes en segundo plano (reports.jobs)
+REPORT_JOB_WORKERS = config('REPORT_JOB_WORKERS', default=2, cast=int)
+# Segundos entre latidos de los trabajos en curso, y segundos sin latido tras los
+# que un trabajo se da por perdido (el proceso que lo ejecutaba se reinició o cayó)
+REPORT_JOB_HEARTBEAT = config('REPORT_JOB_HEARTBEAT', default=30, cast=int)
+REPORT_JOB_STALE_AFTER = config('REPORT_JOB_STALE_AFTER', default=300, cast=int)
+
+# Números de venta reservados por proceso en cada viaje a la base de datos
+# (sales.numbering). Con 1 la numeración no tiene huecos; con bloques mayores
+# cada worker numera sin consultas extra, pero los números sobrantes de un
+# bloque se pierden al reiniciar el proceso.
+SALE_NUMBER_BLOCK_SIZE = config('SALE_NUMBER_BLOCK_SIZE', default=1, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
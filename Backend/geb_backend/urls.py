@@ -1,10 +1,11 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from users.views import UserViewSet
 from products.views import ProductViewSet, CategoryViewSet
+from products.images import serve_image_variant, VARIANT_DIRECTORY
 from customers.views import CustomerViewSet
 from sales.views import SaleViewSet
 from finances.views import TransactionViewSet, ExpenseCategoryViewSet, BudgetViewSet
@@ -35,10 +36,17 @@ router.register(r'project-estimate-items', ProjectEstimateItemViewSet)
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/reports/', include('reports.urls')),
+    path('api/changes/', include('changes.urls')),
     path('api/marketing-analytics/', include('marketing_analytics.urls')),
     path('api/', include(router.urls)),
     path('api/auth/', include('rest_framework.urls')),
     path('test/', include('testing_pages.urls')),
+    # Image variants have content-hashed names: served with far-future cache headers
+    # in every environment, ahead of the rest of MEDIA_URL (see products.images)
+    re_path(
+        r'^%s%s/(?P<name>[^/]+\.webp)$' % (settings.MEDIA_URL.lstrip('/'), VARIANT_DIRECTORY),
+        serve_image_variant, name='product_image_variant'
+    ),
 ]
 
 # Serve media files during development
@@ -0,0 +1,108 @@
+"""
+Versioned product catalog for POS clients (GET /api/products/catalog/).
+
+Every product write stores a version in Product.change_version. A snapshot
+returns all products plus the current version; a delta (?since_version=N)
+returns the products with a higher change_version and the ids deleted since N.
+
+Taking a version never blocks other writers, so sales and product edits do
+not queue behind each other:
+
+- PostgreSQL: the version is the id of the writing transaction
+  (txid_current()). The current version is the snapshot's xmin - 1: every
+  transaction below xmin has finished, so every change <= the version has
+  committed (or rolled back) and is visible to the read that follows.
+- SQLite: one writer at a time holds the database write lock until commit, so
+  the CatalogVersion counter hands out versions in commit order.
+
+The version is read before the products, so a snapshot includes every change
+up to it; a few newer ones may be too, which is harmless because clients apply
+rows by id.
+"""
+import gzip
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import F, Max
+from changes.outbox import finished_transactions_bound
+from .models import Product, Category, CatalogVersion, DeletedProduct
+
+CATALOG_COLUMNS = [
+    'id', 'name', 'type', 'category_id', 'sku', 'price', 'cost',
+    'stock_quantity', 'min_stock_level', 'is_active', 'change_version',
+]
+CATALOG_CHUNK_SIZE = 5000
+
+
+def next_catalog_version():
+    """Version for a product write; call it inside the transaction that writes the rows"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT txid_current()')
+            return cursor.fetchone()[0]
+    counter = CatalogVersion.objects.filter(pk=1)
+    with transaction.atomic():
+        if not counter.update(value=F('value') + 1):
+            CatalogVersion.objects.get_or_create(pk=1, defaults={'value': 0})
+            counter.update(value=F('value') + 1)
+        return counter.values_list('value', flat=True).get()
+
+
+def current_catalog_version():
+    """Highest version whose changes are all committed"""
+    if connection.vendor == 'postgresql':
+        return finished_transactions_bound() - 1
+    return CatalogVersion.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+
+
+def catalog_etag(since_version):
+    """
+    ETag of the catalog, or None while newer changes are still committing.
+    Keyed on the latest stored version: once it is <= the current version, any
+    later write gets a higher one, so the same ETag means the same catalog.
+    """
+    version = current_catalog_version()
+    latest = max(
+        Product.objects.aggregate(latest=Max('change_version'))['latest'] or 0,
+        DeletedProduct.objects.aggregate(latest=Max('change_version'))['latest'] or 0,
+    )
+    if latest > version:
+        return None
+    return '"catalog-%s-%s"' % (latest, since_version)
+
+
+def build_catalog(since_version=None):
+    """Columnar catalog: full snapshot, or only the changes after since_version"""
+    version = current_catalog_version()
+    products = Product.objects.order_by('id')
+    deleted = []
+    if since_version is not None and since_version > version:
+        # Version from another numbering (e.g. a restored database): resync in full
+        since_version = None
+    if since_version is not None:
+        products = products.filter(change_version__gt=since_version)
+        deleted = list(DeletedProduct.objects.filter(
+            change_version__gt=since_version
+        ).values_list('product_id', flat=True))
+
+    columns = {column: [] for column in CATALOG_COLUMNS}
+    for row in products.values_list(*CATALOG_COLUMNS).iterator(chunk_size=CATALOG_CHUNK_SIZE):
+        for column, value in zip(CATALOG_COLUMNS, row):
+            columns[column].append(value)
+
+    return {
+        'version': version,
+        'since_version': since_version,
+        'full': since_version is None,
+        'count': len(columns['id']),
+        'columns': columns,
+        'deleted': deleted,
+        # Small table: always sent whole so clients can resolve category_id
+        'categories': dict(Category.objects.values_list('id', 'name')),
+    }
+
+
+def encode_catalog(catalog, compress=True):
+    """JSON body of the catalog, gzip-compressed when compress is True"""
+    body = json.dumps(catalog, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return gzip.compress(body, compresslevel=6) if compress else body
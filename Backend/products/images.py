@@ -0,0 +1,112 @@
+"""
+Resized WebP variants of product images.
+
+List screens show 48px thumbnails, so sending them the original upload (often
+several MB) wastes almost all of the transfer. When a product image is saved,
+the thumbnail and medium variants are generated with Pillow and stored next to
+it under products/variants/. Their file names end with a hash of their content,
+so the URLs never change meaning and can be cached for a year. They are served
+by serve_image_variant in every environment, so the cache headers do not depend
+on the web server configuration.
+
+Product.image_variants holds {'source': image name, variant name: storage path};
+a source different from the current image means the variants are stale.
+"""
+import hashlib
+import io
+import logging
+import os
+import posixpath
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import HttpResponseNotModified
+from django.views.static import serve
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes (2x the displayed size, for high density screens)
+IMAGE_VARIANTS = {
+    'thumbnail': (96, 96),
+    'medium': (480, 480),
+}
+VARIANT_DIRECTORY = 'products/variants'
+WEBP_QUALITY = 80
+VARIANT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def render_variant(image, size):
+    """WebP bytes of image scaled down to fit size (never scaled up)"""
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    output = io.BytesIO()
+    variant.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return output.getvalue()
+
+
+def build_image_variants(product):
+    """Generate the variants of product.image and store their paths on the product"""
+    old_paths = [path for name, path in product.image_variants.items() if name != 'source']
+    variants = {}
+    image = None
+    if product.image:
+        variants['source'] = product.image.name
+        try:
+            with product.image.open('rb') as file:
+                image = Image.open(file)
+                # JPEG can decode at a reduced scale, much faster for large photos
+                image.draft('RGB', max(IMAGE_VARIANTS.values()))
+                image = ImageOps.exif_transpose(image)
+                image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        except (OSError, Image.DecompressionBombError) as e:
+            # Missing or unreadable original: keep serving it, don't retry on every save
+            logger.warning("Could not build image variants for product %s: %s", product.pk, e)
+    if image is not None:
+        stem = posixpath.splitext(posixpath.basename(product.image.name))[0]
+        for name, size in IMAGE_VARIANTS.items():
+            content = render_variant(image, size)
+            digest = hashlib.sha256(content).hexdigest()[:16]
+            path = f'{VARIANT_DIRECTORY}/{stem}-{name}-{digest}.webp'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(content))
+            variants[name] = path
+
+    for path in old_paths:
+        if path not in variants.values():
+            default_storage.delete(path)
+    type(product).objects.filter(pk=product.pk).update(image_variants=variants)
+    product.image_variants = variants
+    return variants
+
+
+def variants_are_stale(product):
+    source = product.image.name if product.image else None
+    return product.image_variants.get('source') != source
+
+
+def image_variant_urls(product, request=None):
+    """{variant name: URL} for the serializers; empty when there is no image"""
+    urls = {}
+    for name in IMAGE_VARIANTS:
+        path = product.image_variants.get(name)
+        if path:
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def serve_image_variant(request, name):
+    """
+    Serve a variant with far-future caching, in every environment (not only with
+    DEBUG): this view is what guarantees the headers, whatever serves the rest of
+    MEDIA_URL. The content hash in the name is a strong ETag.
+    """
+    etag = '"%s"' % posixpath.splitext(name)[0].rsplit('-', 1)[-1]
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = serve(request, name, document_root=os.path.join(settings.MEDIA_ROOT, VARIANT_DIRECTORY))
+    response['ETag'] = etag
+    response['Cache-Control'] = VARIANT_CACHE_CONTROL
+    return response
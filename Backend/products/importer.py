@@ -0,0 +1,325 @@
+"""
+Bulk product import from supplier CSV/XLSX files.
+
+Rows are streamed from the file and processed in chunks: the SKUs of a chunk
+are resolved with one query, then new products are inserted and existing ones
+updated with one executemany() each, in one transaction per chunk. Empty cells
+leave the current value of an existing product. Invalid rows are reported with
+their line number and skipped; they never abort the import. A file that stops
+decoding part-way keeps the chunks already committed and reports read_error.
+"""
+import csv
+import io
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import connection, transaction, DatabaseError
+from django.utils import timezone
+from changes.outbox import record_changes
+from reports.cache import bump_data_version
+from .models import Product, Category
+from .catalog import next_catalog_version
+
+# Importación condicional de openpyxl (solo para archivos .xlsx)
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+# Importable columns and how to parse them
+DECIMAL_COLUMNS = ['price', 'cost']
+INTEGER_COLUMNS = ['stock_quantity', 'min_stock_level']
+TEXT_COLUMNS = {'name': 200, 'description': None}
+IMPORT_COLUMNS = ['sku', 'name', 'description', 'type', 'category', 'price', 'cost',
+                  'stock_quantity', 'min_stock_level', 'is_active']
+TRUE_VALUES = {'1', 'true', 'si', 'sí', 'yes', 'y', 'x', 'activo'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactivo'}
+PRODUCT_TYPES = {value for value, _ in Product.PRODUCT_TYPES}
+
+# Written columns and the default for new products (name and price are required)
+INSERT_DEFAULTS = [
+    ('sku', None), ('name', None), ('description', ''), ('type', 'product'), ('category_id', None),
+    ('price', None), ('cost', Decimal('0')), ('stock_quantity', 0), ('min_stock_level', 0),
+    ('is_active', True),
+]
+UPDATE_COLUMNS = INSERT_DEFAULTS[1:]
+INSERT_DECIMAL_POSITIONS = [i for i, (column, _) in enumerate(INSERT_DEFAULTS) if column in DECIMAL_COLUMNS]
+UPDATE_DECIMAL_POSITIONS = [i for i, (column, _) in enumerate(UPDATE_COLUMNS) if column in DECIMAL_COLUMNS]
+
+# Plain executemany upserts: bulk_create() spends most of an import preparing
+# every model field of every row, which keeps it well under 10k rows/s.
+# Both updates take the row's raw values (NULL for an empty cell) and keep the
+# current value with COALESCE, so empty cells change nothing.
+UPDATE_ASSIGNMENTS = (
+    '%s, is_low_stock = (COALESCE(%%s, products.stock_quantity) <= COALESCE(%%s, products.min_stock_level))' % (
+        ', '.join('%s = COALESCE(%%s, products.%s)' % (column, column) for column, _ in UPDATE_COLUMNS)
+    )
+)
+# ON CONFLICT covers a SKU created by someone else since the chunk was resolved
+INSERT_SQL = (
+    'INSERT INTO products (%s, is_low_stock, image_variants, change_version, created_by_id, created_at, updated_at) '
+    'VALUES (%s) ON CONFLICT (sku) DO UPDATE SET %s, '
+    'change_version = excluded.change_version, updated_at = excluded.updated_at' % (
+        ', '.join(column for column, _ in INSERT_DEFAULTS),
+        ', '.join(['%s'] * (len(INSERT_DEFAULTS) + 6)),
+        UPDATE_ASSIGNMENTS,
+    )
+)
+UPDATE_SQL = 'UPDATE products SET %s, change_version = %%s, updated_at = %%s WHERE id = %%s' % UPDATE_ASSIGNMENTS
+# Raised while reading the rest of the file; the rows read so far are still imported
+READ_ERRORS = (UnicodeDecodeError, csv.Error)
+
+
+class ImportFormatError(Exception):
+    """The file cannot be read as a product sheet (bad format or missing sku column)"""
+
+
+def normalize_header(header):
+    return [str(name or '').strip().lower() for name in header]
+
+
+def read_csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = normalize_header(next(reader, []))
+    yield header
+    yield from reader
+
+
+def read_xlsx_rows(file):
+    if not OPENPYXL_AVAILABLE:
+        raise ImportFormatError('openpyxl no está instalado: no se pueden importar archivos .xlsx')
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        yield normalize_header(next(rows, []))
+        yield from rows
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename):
+    """Yield (line number, {column: value}) for each data row of the file"""
+    reader = read_xlsx_rows(file) if filename.lower().endswith('.xlsx') else read_csv_rows(file)
+    header = next(reader)
+    if 'sku' not in header:
+        raise ImportFormatError('El archivo debe tener una columna "sku"')
+    columns = [(position, name) for position, name in enumerate(header) if name in IMPORT_COLUMNS]
+    for line, values in enumerate(reader, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield line, {
+            name: values[position] if position < len(values) else None
+            for position, name in columns
+        }
+
+
+def parse_row(row):
+    """Convert raw cell values to model values; returns (values, errors)"""
+    values = {}
+    errors = {}
+    for column, raw in row.items():
+        text = '' if raw is None else str(raw).strip()
+        if column == 'sku':
+            if not text:
+                errors['sku'] = 'SKU requerido'
+            elif len(text) > 50:
+                errors['sku'] = 'SKU de más de 50 caracteres'
+            values['sku'] = text
+        elif column in TEXT_COLUMNS:
+            max_length = TEXT_COLUMNS[column]
+            if max_length and len(text) > max_length:
+                errors[column] = f'Más de {max_length} caracteres'
+            elif text:
+                values[column] = text
+        elif column in DECIMAL_COLUMNS:
+            if text:
+                try:
+                    values[column] = Decimal(text.replace(',', '.')).quantize(Decimal('0.01'))
+                except InvalidOperation:
+                    errors[column] = f'"{text}" no es un número válido'
+        elif column in INTEGER_COLUMNS:
+            if text:
+                try:
+                    values[column] = int(Decimal(text.replace(',', '.')))
+                except (InvalidOperation, ValueError):
+                    errors[column] = f'"{text}" no es un número entero válido'
+        elif column == 'type':
+            if text:
+                if text.lower() not in PRODUCT_TYPES:
+                    errors['type'] = 'Tipo debe ser "product" o "service"'
+                values['type'] = text.lower()
+        elif column == 'is_active':
+            if text:
+                if text.lower() in TRUE_VALUES:
+                    values['is_active'] = True
+                elif text.lower() in FALSE_VALUES:
+                    values['is_active'] = False
+                else:
+                    errors['is_active'] = f'"{text}" no es un valor booleano válido'
+        elif column == 'category':
+            if text:
+                values['category'] = text
+    return values, errors
+
+
+class ProductImporter:
+    """Upserts parsed rows chunk by chunk and collects the per-row results"""
+
+    def __init__(self, user=None, chunk_size=IMPORT_CHUNK_SIZE):
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        self.no_variants = Product._meta.get_field('image_variants').get_db_prep_save({}, connection)
+        self.chunk_size = chunk_size
+        self.categories = {}
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.rows = 0
+
+    def add_error(self, line, sku, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'sku': sku, 'errors': errors})
+
+    def category_id(self, name):
+        key = name.lower()
+        if key not in self.categories:
+            category = Category.objects.filter(name__iexact=name).first()
+            if category is None:
+                category = Category.objects.create(name=name[:100])
+            self.categories[key] = category.pk
+        return self.categories[key]
+
+    def run(self, rows):
+        started = time.perf_counter()
+        rows = iter(rows)
+        read_error = None
+        last_line = 1
+        while read_error is None:
+            chunk = []
+            try:
+                for row in islice(rows, self.chunk_size):
+                    chunk.append(row)
+            except READ_ERRORS as e:
+                # Earlier chunks are already committed: import up to here and report it
+                last_line = chunk[-1][0] if chunk else last_line
+                read_error = f'Lectura interrumpida después de la fila {last_line}: {e}'
+            if not chunk:
+                break
+            last_line = chunk[-1][0]
+            self.import_chunk(chunk)
+        if self.created or self.updated:
+            bump_data_version()
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'errors': self.error_count,
+            'error_rows': self.errors,
+            'read_error': read_error,
+            'seconds': round(time.perf_counter() - started, 2),
+        }
+
+    def parse_chunk(self, chunk):
+        """Valid rows by SKU; a SKU repeated in the chunk keeps its last row"""
+        parsed = {}
+        for line, row in chunk:
+            self.rows += 1
+            values, errors = parse_row(row)
+            if errors:
+                self.add_error(line, values.get('sku'), errors)
+                continue
+            if 'category' in values:
+                values['category_id'] = self.category_id(values.pop('category'))
+            if values['sku'] in parsed:
+                previous_line = parsed[values['sku']][0]
+                self.add_error(previous_line, values['sku'], {'sku': f'SKU repetido; se usa la fila {line}'})
+            parsed[values['sku']] = (line, values)
+        return parsed
+
+    def import_chunk(self, chunk):
+        parsed = self.parse_chunk(chunk)
+        if not parsed:
+            return
+        existing = dict(Product.objects.filter(sku__in=list(parsed)).values_list('sku', 'pk'))
+        new_rows = []
+        updated_rows = []
+        for sku, (line, values) in parsed.items():
+            if sku in existing:
+                updated_rows.append((line, values))
+                continue
+            missing = [column for column in ('name', 'price') if column not in values]
+            if missing:
+                self.add_error(line, sku, {column: 'Requerido para productos nuevos' for column in missing})
+                continue
+            new_rows.append((line, values))
+        if not new_rows and not updated_rows:
+            return
+
+        try:
+            with transaction.atomic():
+                version = next_catalog_version()
+                now = connection.ops.adapt_datetimefield_value(timezone.now())
+                with connection.cursor() as cursor:
+                    if new_rows:
+                        cursor.executemany(INSERT_SQL, [
+                            self.insert_params(values, version, now) for _, values in new_rows
+                        ])
+                    if updated_rows:
+                        cursor.executemany(UPDATE_SQL, [
+                            update_params(values, version, now, existing[values['sku']]) for _, values in updated_rows
+                        ])
+                new_ids = Product.objects.filter(
+                    sku__in=[values['sku'] for _, values in new_rows]
+                ).values_list('pk', flat=True) if new_rows else []
+                record_changes(Product, new_ids, 'create')
+                record_changes(Product, [existing[values['sku']] for _, values in updated_rows])
+        except DatabaseError as e:
+            for line, values in new_rows + updated_rows:
+                self.add_error(line, values['sku'], {'non_field_errors': str(e)})
+            return
+        self.created += len(new_rows)
+        self.updated += len(updated_rows)
+
+    def insert_params(self, values, version, now):
+        row = [values.get(column, default) for column, default in INSERT_DEFAULTS]
+        is_low_stock = values.get('stock_quantity', 0) <= values.get('min_stock_level', 0)
+        return adapt_decimals(row, INSERT_DECIMAL_POSITIONS) + [
+            is_low_stock, self.no_variants, version, self.user_id, now, now
+        ] + assignment_params(values)
+
+
+def assignment_params(values):
+    # NULL leaves the current value (COALESCE in UPDATE_ASSIGNMENTS): empty cells change nothing
+    row = [values.get(column) for column, _ in UPDATE_COLUMNS]
+    return adapt_decimals(row, UPDATE_DECIMAL_POSITIONS) + [
+        values.get('stock_quantity'), values.get('min_stock_level')
+    ]
+
+
+def update_params(values, version, now, pk):
+    return assignment_params(values) + [version, now, pk]
+
+
+def adapt_decimals(row, positions):
+    adapt = connection.ops.adapt_decimalfield_value
+    for position in positions:
+        if row[position] is not None:
+            row[position] = adapt(row[position], 10, 2)
+    return row
+
+
+def import_products(file, filename, user=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import a CSV/XLSX product sheet; returns the summary with per-row errors"""
+    return ProductImporter(user=user, chunk_size=chunk_size).run(read_rows(file, filename))
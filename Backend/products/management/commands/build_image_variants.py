@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.images import build_image_variants, variants_are_stale
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes WebP (miniatura y mediana) de las imágenes de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenera también las variantes que ya están al día (p. ej. tras cambiar los tamaños)'
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'image_variants')
+        for product in products.iterator():
+            if options['all'] or variants_are_stale(product):
+                build_image_variants(product)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f'Variantes generadas para {built} productos'))
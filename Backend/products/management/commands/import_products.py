@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import import_products, ImportFormatError, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Importa productos desde un archivo CSV o XLSX de proveedor (crea o actualiza por SKU)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+            help=f'Filas por lote de escritura (por defecto {IMPORT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                summary = import_products(file, path, chunk_size=options['chunk_size'])
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir {path}: {e}')
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+
+        for error in summary['error_rows']:
+            self.stdout.write(self.style.WARNING(f"Fila {error['row']} ({error['sku']}): {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['rows']} filas en {summary['seconds']}s: {summary['created']} creados, "
+            f"{summary['updated']} actualizados, {summary['errors']} con errores"
+        ))
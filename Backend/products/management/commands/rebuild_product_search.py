@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from products.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Crea o repara el índice de búsqueda de productos (FTS5 en SQLite, tsvector/pg_trgm en PostgreSQL)'
+
+    def handle(self, *args, **options):
+        # Full rebuild; after migrations the post_migrate handler only restores a missing index
+        install_search_index(connection)
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda de productos listo ({connection.vendor})'))
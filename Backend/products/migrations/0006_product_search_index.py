@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from products.search import install_search_index
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import drop_search_index
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_auto_20250723_1308'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, drop_search_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:25
+
+from django.db import migrations, models
+
+
+def seed_catalog_version(apps, schema_editor):
+    # Existing products all start at version 1
+    apps.get_model('products', 'CatalogVersion').objects.create(pk=1, value=1)
+    apps.get_model('products', 'Product').objects.update(change_version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_stock_adjustments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'catalog_version',
+            },
+        ),
+        migrations.CreateModel(
+            name='DeletedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('change_version', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'deleted_products',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='change_version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(seed_catalog_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_is_low_stock(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(stock_quantity__lte=models.F('min_stock_level')).update(is_low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_is_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_low_stock', True)), fields=['type', 'created_at'], name='products_low_stock_idx'),
+        ),
+    ]
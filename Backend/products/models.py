@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -39,8 +39,15 @@ class Product(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     stock_quantity = models.IntegerField(default=0)
     min_stock_level = models.IntegerField(default=0)
+    # stock_quantity <= min_stock_level, stored so low-stock queries can use an index;
+    # kept in sync by save(), products.stock.apply_stock_deltas and the importer
+    is_low_stock = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Storage paths of the resized WebP copies of image (see products.images)
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Catalog version of the last change to this product (see products.catalog)
+    change_version = models.BigIntegerField(default=0, db_index=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -48,9 +55,16 @@ class Product(models.Model):
     def __str__(self):
         return self.name
     
-    @property
-    def is_low_stock(self):
-        return self.stock_quantity <= self.min_stock_level
+    def save(self, *args, **kwargs):
+        from .catalog import next_catalog_version
+        self.is_low_stock = self.stock_quantity <= self.min_stock_level
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'change_version', 'is_low_stock'}
+        # The version is taken by the transaction that writes the row (on
+        # PostgreSQL it is that transaction's id, see products.catalog)
+        with transaction.atomic(using=kwargs.get('using')):
+            self.change_version = next_catalog_version()
+            super().save(*args, **kwargs)
     
     @property
     def profit_margin(self):
@@ -61,3 +75,56 @@ class Product(models.Model):
     class Meta:
         db_table = 'products'
         ordering = ['-created_at', 'name']  # Order by newest first, then by name
+        indexes = [
+            # Only the (few) active low-stock rows: serves the low_stock list and count
+            models.Index(
+                fields=['type', 'created_at'], name='products_low_stock_idx',
+                condition=models.Q(is_low_stock=True, is_active=True)
+            ),
+        ]
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counter behind Product.change_version on SQLite, where writers
+    are already serialized by the database lock (PostgreSQL uses transaction
+    ids instead, see products.catalog).
+    """
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return str(self.value)
+    
+    class Meta:
+        db_table = 'catalog_version'
+
+
+class DeletedProduct(models.Model):
+    """Tombstone of a deleted product, so catalog deltas can report deletions"""
+    product_id = models.BigIntegerField()
+    change_version = models.BigIntegerField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.product_id} @ {self.change_version}"
+    
+    class Meta:
+        db_table = 'deleted_products'
+
+
+class StockAdjustment(models.Model):
+    """
+    Manual stock movement (deliveries, counts, shrinkage) applied through
+    /api/products/stock-adjustments/ or update_stock.
+    """
+    product = models.ForeignKey(Product, related_name='stock_adjustments', on_delete=models.CASCADE)
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=200, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.delta:+d}"
+    
+    class Meta:
+        db_table = 'stock_adjustments'
+        ordering = ['-created_at']
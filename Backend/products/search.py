@@ -0,0 +1,237 @@
+"""
+Full-text product search.
+
+SQLite (development) uses an FTS5 table over name, sku and description kept in
+sync by triggers on the products table. PostgreSQL (production) uses a generated
+tsvector column with a GIN index, plus pg_trgm for typo-tolerant matching on the
+name. Both return ranked product ids; the view then applies its other filters.
+
+An exact SKU/barcode match skips the index entirely (unique index lookup).
+When no index is available, search_product_ids() returns None and the caller
+falls back to icontains filtering.
+"""
+import difflib
+import re
+from django.db import connection, DatabaseError
+from .models import Product
+
+SEARCH_RESULT_LIMIT = 200
+# Typo fallback: only for terms at least this long, comparing terms of similar length
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+
+SQLITE_SEARCH_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, sku, description, content='products', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts_vocab USING fts5vocab(products_fts, 'row')",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, sku, description) VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO products_fts(rowid, name, sku, description) VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS products_fts_ai",
+    "DROP TRIGGER IF EXISTS products_fts_ad",
+    "DROP TRIGGER IF EXISTS products_fts_au",
+    "DROP TABLE IF EXISTS products_fts_vocab",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+POSTGRESQL_SEARCH_SQL = [
+    """ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sku, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS products_search_vector_idx ON products USING gin (search_vector)",
+]
+
+POSTGRESQL_TRIGRAM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS products_name_trgm_idx ON products USING gin (name gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP_SQL = [
+    "DROP INDEX IF EXISTS products_name_trgm_idx",
+    "DROP INDEX IF EXISTS products_search_vector_idx",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_vector",
+]
+
+# Per-process cache of which index features the database has
+_features = {}
+
+
+def database_wrapper(schema_editor_or_connection):
+    """Django connection from a schema editor (migrations) or a connection"""
+    if hasattr(schema_editor_or_connection, 'vendor'):
+        return schema_editor_or_connection
+    return schema_editor_or_connection.connection
+
+
+def install_search_index(schema_editor_or_connection):
+    """Create (or repair) the search index for the current database; idempotent"""
+    conn = database_wrapper(schema_editor_or_connection)
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            try:
+                for sql in SQLITE_SEARCH_SQL:
+                    cursor.execute(sql)
+            except DatabaseError:
+                # SQLite built without FTS5: search keeps using icontains
+                pass
+        elif conn.vendor == 'postgresql':
+            for sql in POSTGRESQL_SEARCH_SQL:
+                cursor.execute(sql)
+            try:
+                cursor.execute('SAVEPOINT products_trgm')
+                for sql in POSTGRESQL_TRIGRAM_SQL:
+                    cursor.execute(sql)
+                cursor.execute('RELEASE SAVEPOINT products_trgm')
+            except DatabaseError:
+                # pg_trgm needs privileges to install; without it there is no typo fallback
+                cursor.execute('ROLLBACK TO SAVEPOINT products_trgm')
+    _features.clear()
+
+
+def ensure_search_index(conn):
+    """
+    Reinstall the index if it went missing. On SQLite, migrations that rebuild the
+    products table drop its triggers, so this runs after every migrate.
+    """
+    if conn.vendor == 'sqlite':
+        check = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'products_fts_au'"
+    elif conn.vendor == 'postgresql':
+        check = (
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'products' AND column_name = 'search_vector'"
+        )
+    else:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(check)
+        missing = cursor.fetchone() is None
+    if missing:
+        install_search_index(conn)
+
+
+def drop_search_index(schema_editor_or_connection):
+    conn = database_wrapper(schema_editor_or_connection)
+    statements = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRESQL_DROP_SQL}.get(conn.vendor, [])
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    _features.clear()
+
+
+def has_feature(name, sql):
+    if name not in _features:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            _features[name] = cursor.fetchone() is not None
+    return _features[name]
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def exact_sku_match(query):
+    """Id of the product whose SKU/barcode is exactly query, if any"""
+    if not query or ' ' in query.strip():
+        return None
+    return Product.objects.filter(sku=query.strip()).values_list('pk', flat=True).first()
+
+
+def sqlite_search(terms, limit):
+    if not has_feature('fts5', "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"):
+        return None
+
+    def ranked(expression):
+        with connection.cursor() as cursor:
+            # bm25 weights: name, sku, description (lower score is better)
+            cursor.execute(
+                "SELECT rowid FROM products_fts WHERE products_fts MATCH %s "
+                "ORDER BY bm25(products_fts, 10.0, 8.0, 1.0) LIMIT %s",
+                [expression, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # Every term as a prefix: "lap 15" matches "laptop 15.6"
+    ids = ranked(' '.join('"%s"*' % term for term in terms))
+    if ids:
+        return ids
+
+    # Typo fallback: replace each term with close terms from the index vocabulary
+    alternatives = []
+    with connection.cursor() as cursor:
+        for term in terms:
+            options = [term]
+            if len(term) >= FUZZY_MIN_LENGTH:
+                cursor.execute(
+                    "SELECT term FROM products_fts_vocab WHERE term >= %s AND term < %s "
+                    "AND length(term) BETWEEN %s AND %s",
+                    [term[0], term[0] + '￿', len(term) - 2, len(term) + 2]
+                )
+                vocabulary = [row[0] for row in cursor.fetchall()]
+                options += difflib.get_close_matches(term, vocabulary, n=3, cutoff=FUZZY_CUTOFF)
+            alternatives.append('(%s)' % ' OR '.join('"%s"*' % option for option in dict.fromkeys(options)))
+    # FTS5 has no implicit AND next to a parenthesized group
+    return ranked(' AND '.join(alternatives))
+
+
+def postgresql_search(terms, limit):
+    if not has_feature('tsvector', (
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'products' AND column_name = 'search_vector'"
+    )):
+        return None
+
+    tsquery = ' & '.join('%s:*' % term for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id FROM products WHERE search_vector @@ to_tsquery('simple', %s) "
+            "ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, id LIMIT %s",
+            [tsquery, tsquery, limit]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if ids or not has_feature('pg_trgm', "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"):
+            return ids
+
+        # Typo fallback: trigram similarity on the name (uses products_name_trgm_idx)
+        query = ' '.join(terms)
+        cursor.execute(
+            "SELECT id FROM products WHERE name %% %s ORDER BY similarity(name, %s) DESC, id LIMIT %s",
+            [query, query, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_product_ids(query, limit=SEARCH_RESULT_LIMIT):
+    """
+    Ids of the products matching query, best match first, or None when the
+    database has no search index.
+    """
+    sku_match = exact_sku_match(query)
+    if sku_match is not None:
+        return [sku_match]
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        return sqlite_search(terms, limit)
+    if connection.vendor == 'postgresql':
+        return postgresql_search(terms, limit)
+    return None
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Product, Category
+from .images import image_variant_urls
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -22,17 +23,21 @@ class ProductSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     is_low_stock = serializers.ReadOnlyField()
     profit_margin = serializers.ReadOnlyField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'type', 'category', 'category_name',
             'sku', 'price', 'cost', 'stock_quantity', 'min_stock_level',
-            'is_active', 'image', 'is_low_stock', 'profit_margin',
+            'is_active', 'image', 'image_variants', 'is_low_stock', 'profit_margin',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def get_image_variants(self, obj):
+        return image_variant_urls(obj, self.context.get('request'))
+
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
@@ -60,10 +65,47 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
 class ProductListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     is_low_stock = serializers.ReadOnlyField()
+    # Resized, content-hashed WebP URLs instead of the original upload
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'type', 'category_name', 'sku', 'price',
-            'stock_quantity', 'is_active', 'is_low_stock'
+            'stock_quantity', 'is_active', 'is_low_stock', 'image_variants'
         ]
+
+    def get_image_variants(self, obj):
+        return image_variant_urls(obj, self.context.get('request'))
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    """One row of POST /api/products/stock-adjustments/"""
+    product = serializers.IntegerField()
+    delta = serializers.IntegerField()
+    reason = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+
+    def validate_delta(self, value):
+        if value == 0:
+            raise serializers.ValidationError("El ajuste no puede ser cero")
+        return value
+
+
+class StockAdjustmentListSerializer(serializers.ListSerializer):
+    """Checks every referenced product with a single query"""
+    child = StockAdjustmentSerializer()
+
+    def validate(self, attrs):
+        products = Product.objects.in_bulk({row['product'] for row in attrs})
+        errors = []
+        for row in attrs:
+            product = products.get(row['product'])
+            if product is None:
+                errors.append({'product': [f"Producto {row['product']} no existe"]})
+            elif product.type != 'product':
+                errors.append({'product': [f"{product.name} es un servicio y no maneja stock"]})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
@@ -0,0 +1,28 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from .models import Product, DeletedProduct
+from .catalog import next_catalog_version
+from .search import ensure_search_index
+from .images import build_image_variants, variants_are_stale
+
+
+def record_deleted_product(sender, instance, **kwargs):
+    DeletedProduct.objects.create(product_id=instance.pk, change_version=next_catalog_version())
+
+
+def refresh_image_variants(sender, instance, raw=False, **kwargs):
+    # Upload time is the only moment the original is read; lists only get the variants
+    # After commit, so resizing never holds the product's transaction open
+    if not raw and variants_are_stale(instance):
+        transaction.on_commit(lambda: build_image_variants(instance))
+
+
+def restore_search_index(sender, using, plan=None, **kwargs):
+    # Only when products migrations ran forward (a backwards migrate may have dropped the table)
+    if plan and any(migration.app_label == 'products' and not backwards for migration, backwards in plan):
+        ensure_search_index(connections[using])
+
+
+post_delete.connect(record_deleted_product, sender=Product, dispatch_uid='products_catalog_delete')
+post_save.connect(refresh_image_variants, sender=Product, dispatch_uid='products_image_variants')
+post_migrate.connect(restore_search_index, dispatch_uid='products_search_index_migrate')
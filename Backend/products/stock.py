@@ -0,0 +1,97 @@
+"""
+Set-based stock updates.
+
+Stock changes are applied with F() expressions in a single UPDATE, so concurrent
+writers never overwrite each other's changes (unlike read-modify-write + save()).
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q, IntegerField
+from django.utils import timezone
+from changes.outbox import record_changes
+from reports.cache import bump_data_version
+from .models import Product, StockAdjustment
+from .catalog import next_catalog_version
+
+
+class InsufficientStock(Exception):
+    """Raised by apply_stock_adjustments; shortages maps product_id to available stock"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Stock insuficiente para los productos {sorted(shortages)}")
+
+
+def lock_products(product_ids):
+    """Lock the given products (in pk order, to avoid deadlocks) and return them by pk"""
+    products = Product.objects.select_for_update().filter(pk__in=list(product_ids)).order_by('pk')
+    return {product.pk: product for product in products}
+
+
+def apply_stock_deltas(deltas, guard=False):
+    """
+    Add deltas ({product_id: quantity}, negative to decrement) to stock in one query.
+    With guard=True only rows whose stock stays >= 0 are updated (stock_quantity__gte=-delta).
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    change = Case(
+        *[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    products = Product.objects.filter(pk__in=list(deltas))
+    if guard:
+        products = products.filter(reduce(or_, [
+            Q(pk=product_id, stock_quantity__gte=-delta) if delta < 0 else Q(pk=product_id)
+            for product_id, delta in deltas.items()
+        ]))
+    # One transaction for the version, the rows and the outbox (see products.catalog)
+    with transaction.atomic():
+        updated = products.update(
+            stock_quantity=F('stock_quantity') + change,
+            # Evaluated against the old row: new stock <= min  <=>  old stock <= min - change
+            is_low_stock=Case(
+                When(stock_quantity__lte=F('min_stock_level') - change, then=Value(True)),
+                default=Value(False)
+            ),
+            change_version=next_catalog_version(),
+            updated_at=timezone.now()
+        )
+        record_changes(Product, deltas)
+    return updated
+
+
+def apply_stock_adjustments(rows, user=None):
+    """
+    Apply manual adjustments ([{'product': id, 'delta': n, 'reason': str}]) atomically:
+    one guarded UPDATE for all products, one INSERT for the log and one SELECT for
+    the new levels. Raises InsufficientStock (and changes nothing) if any product
+    would go below zero. Returns {product_id: new stock_quantity}.
+    """
+    deltas = defaultdict(int)
+    for row in rows:
+        deltas[row['product']] += row['delta']
+    changed = [product_id for product_id, delta in deltas.items() if delta]
+    try:
+        with transaction.atomic():
+            if apply_stock_deltas(deltas, guard=True) != len(changed):
+                raise InsufficientStock({})
+            levels = dict(Product.objects.filter(pk__in=list(deltas)).values_list('pk', 'stock_quantity'))
+            StockAdjustment.objects.bulk_create([
+                StockAdjustment(product_id=row['product'], delta=row['delta'], reason=row.get('reason', ''), created_by=user)
+                for row in rows
+            ])
+            # update()/bulk_create send no post_save: invalidate cached reports ourselves
+            transaction.on_commit(bump_data_version)
+    except InsufficientStock:
+        # Rolled back; report the current stock of the products that would go negative
+        current = dict(Product.objects.filter(pk__in=changed).values_list('pk', 'stock_quantity'))
+        raise InsufficientStock({
+            product_id: current.get(product_id, 0) for product_id in changed
+            if current.get(product_id, 0) + deltas[product_id] < 0
+        })
+    return levels
@@ -1,3 +1,303 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.db import connection, connections, transaction
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from .models import Product, StockAdjustment
+from .search import search_product_ids, install_search_index
+from .catalog import build_catalog, current_catalog_version
+from .stock import lock_products, apply_stock_deltas, apply_stock_adjustments, InsufficientStock
+from .importer import import_products
 
-# Create your tests here.
+
+class ProductSearchTests(TestCase):
+    """Multi-word searches go through the FTS5 typo fallback when the prefix query finds nothing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        install_search_index(connection)
+        cls.laptop = Product.objects.create(name='Laptop Dell Inspiron', sku='LAP-001', price=Decimal('900'))
+        Product.objects.create(name='Mouse inalámbrico', sku='MOU-001', price=Decimal('20'))
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Búsqueda FTS5 solo en SQLite')
+        if search_product_ids('laptop') is None:
+            self.skipTest('SQLite sin FTS5')
+
+    def test_multi_word_query_without_matches(self):
+        self.assertEqual(search_product_ids('foo bar'), [])
+        self.assertEqual(search_product_ids('laptop hp'), [])
+
+    def test_multi_word_query_with_typo(self):
+        self.assertEqual(search_product_ids('laptpo dell'), [self.laptop.pk])
+
+
+
+def csv_file(*lines):
+    return io.BytesIO(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+class ProductImportTests(TestCase):
+    """Products matched by SKU: new ones created, existing ones updated cell by cell"""
+
+    HEADER = 'sku,name,description,price,cost,stock_quantity,min_stock_level,is_active'
+
+    def setUp(self):
+        self.existing = Product.objects.create(
+            name='Teclado', sku='KEY-001', description='Mecánico', price=Decimal('50'),
+            cost=Decimal('30'), stock_quantity=8, min_stock_level=2
+        )
+
+    def import_csv(self, *lines, **kwargs):
+        return import_products(csv_file(self.HEADER, *lines), 'productos.csv', **kwargs)
+
+    def test_creates_new_products(self):
+        summary = self.import_csv('NEW-001,Monitor,24 pulgadas,199.90,120,3,5,si')
+        self.assertEqual((summary['created'], summary['updated'], summary['errors']), (1, 0, 0))
+        product = Product.objects.get(sku='NEW-001')
+        self.assertEqual((product.name, product.price, product.stock_quantity), ('Monitor', Decimal('199.90'), 3))
+        self.assertTrue(product.is_low_stock)
+
+    def test_updates_existing_products(self):
+        summary = self.import_csv('KEY-001,Teclado RGB,,55,,20,,')
+        self.assertEqual((summary['created'], summary['updated']), (0, 1))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price, self.existing.stock_quantity), ('Teclado RGB', Decimal('55.00'), 20))
+
+    def test_empty_cells_keep_current_values(self):
+        self.import_csv('KEY-001,,,60,,,,')
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.price, Decimal('60.00'))
+        self.assertEqual(
+            (self.existing.name, self.existing.description, self.existing.cost, self.existing.stock_quantity, self.existing.is_active),
+            ('Teclado', 'Mecánico', Decimal('30.00'), 8, True)
+        )
+
+    def test_sku_created_concurrently_keeps_current_values(self):
+        # The SKU appears after the chunk was resolved: the INSERT hits ON CONFLICT
+        filter_products = Product.objects.filter
+        lookups = []
+
+        def stale_lookup(*args, **kwargs):
+            lookups.append(kwargs)
+            return Product.objects.none() if len(lookups) == 1 else filter_products(*args, **kwargs)
+
+        with mock.patch.object(Product.objects, 'filter', side_effect=stale_lookup):
+            summary = self.import_csv('KEY-001,Teclado inalámbrico,,70,,,,')
+        self.assertEqual((summary['created'], summary['errors']), (1, 0))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price), ('Teclado inalámbrico', Decimal('70.00')))
+        self.assertEqual(
+            (self.existing.description, self.existing.cost, self.existing.stock_quantity, self.existing.is_low_stock),
+            ('Mecánico', Decimal('30.00'), 8, False)
+        )
+
+    def test_repeated_sku_keeps_last_row(self):
+        summary = self.import_csv('KEY-001,,,51,,,,', 'KEY-001,,,52,,,,')
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(summary['error_rows'], [
+            {'row': 2, 'sku': 'KEY-001', 'errors': {'sku': 'SKU repetido; se usa la fila 3'}}
+        ])
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.price, Decimal('52.00'))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        summary = self.import_csv(
+            'BAD-001,Cable,,abc,,,,',
+            'BAD-002,,,10,,,,',
+            'OK-001,Cable USB,,5,,,,',
+        )
+        self.assertEqual((summary['rows'], summary['created'], summary['errors']), (3, 1, 2))
+        self.assertEqual([error['row'] for error in summary['error_rows']], [2, 3])
+        self.assertIn('price', summary['error_rows'][0]['errors'])
+        self.assertIn('name', summary['error_rows'][1]['errors'])
+        self.assertEqual(list(Product.objects.filter(sku__startswith='BAD')), [])
+
+    def test_unreadable_tail_returns_partial_summary(self):
+        lines = [f'ROW-{i:04d},Producto {i} con nombre largo,,{i}.50,,,,' for i in range(600)]
+        body = ('\n'.join([self.HEADER] + lines) + '\n').encode('utf-8') + b'ROW-X,\xff\xfe roto,,1,,,,\n'
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='importer', password='x'))
+        response = client.post('/api/products/import/', {'file': SimpleUploadedFile('productos.csv', body)})
+        self.assertEqual(response.status_code, 200)
+        # Rows are decoded a buffer at a time: the ones before the bad buffer are kept
+        imported = response.data['created']
+        self.assertGreater(imported, 0)
+        self.assertEqual(response.data['rows'], imported)
+        self.assertIn(f'después de la fila {imported + 1}', response.data['read_error'])
+        self.assertEqual(Product.objects.filter(sku__startswith='ROW-').count(), imported)
+
+
+class ImageVariantServingTests(TestCase):
+    """Variants are served with far-future caching without DEBUG (the test runner disables it)"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        photo = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(photo, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(
+                name='Foto', sku='IMG-001', price=Decimal('1'),
+                image=SimpleUploadedFile('foto.png', photo.getvalue())
+            )
+        self.product.refresh_from_db()
+
+    def test_variant_is_served_with_cache_headers(self):
+        url = '/media/' + self.product.image_variants['thumbnail']
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        etag = response['ETag']
+        self.assertIn(etag.strip('"'), url)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_only_variants_are_served(self):
+        self.assertEqual(self.client.get('/media/' + self.product.image.name).status_code, 404)
+        self.assertEqual(self.client.get('/media/products/variants/missing-thumbnail-0123456789abcdef.webp').status_code, 404)
+
+
+class CatalogVersionConcurrencyTests(TransactionTestCase):
+    """Taking a catalog version must not serialize sales and product edits"""
+
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('SQLite serializa a todos los escritores con un único bloqueo')
+        self.sold = Product.objects.create(name='Vendido', sku='SOLD-1', price=Decimal('10'), stock_quantity=10)
+        self.edited = Product.objects.create(name='Editado', sku='EDIT-1', price=Decimal('10'), stock_quantity=10)
+        self.before = current_catalog_version()
+        self.errors = []
+
+    def run_in_thread(self, target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                self.errors.append(e)
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def wait_for_lock_waiter(self):
+        """Block until another session is waiting on a row lock"""
+        for _ in range(500):
+            with connection.cursor() as cursor:
+                # pg_stat_activity is otherwise frozen for the rest of the transaction
+                cursor.execute('SELECT pg_stat_clear_snapshot()')
+                cursor.execute(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                )
+                if cursor.fetchone()[0]:
+                    return
+            threading.Event().wait(0.01)
+        self.fail('Ninguna sesión quedó esperando el bloqueo')
+
+    def test_product_edit_does_not_wait_for_open_sale(self):
+        sale_open = threading.Event()
+        edit_done = threading.Event()
+        finished_during_sale = []
+
+        def sale():
+            # The stock steps of SaleCreateSerializer.create
+            with transaction.atomic():
+                lock_products([self.sold.pk])
+                apply_stock_deltas({self.sold.pk: -1})
+                sale_open.set()
+                finished_during_sale.append(edit_done.wait(10))
+
+        thread = self.run_in_thread(sale)
+        self.assertTrue(sale_open.wait(10))
+        self.edited.name = 'Editado 2'
+        self.edited.save()
+        edit_done.set()
+        thread.join()
+
+        self.assertEqual(self.errors, [])
+        self.assertEqual(finished_during_sale, [True])
+        delta = build_catalog(self.before)
+        self.assertEqual(set(delta['columns']['id']), {self.sold.pk, self.edited.pk})
+
+    def test_sale_and_edit_of_the_same_product_do_not_deadlock(self):
+        locked = threading.Event()
+
+        def sale():
+            with transaction.atomic():
+                lock_products([self.sold.pk])
+                locked.set()
+                # The edit is now queued on the product row; take the version after it
+                self.wait_for_lock_waiter()
+                apply_stock_deltas({self.sold.pk: -1})
+
+        def edit():
+            locked.wait(10)
+            product = Product.objects.get(pk=self.sold.pk)
+            product.name = 'Vendido 2'
+            product.save(update_fields=['name'])
+
+        threads = [self.run_in_thread(sale), self.run_in_thread(edit)]
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.errors, [])
+        self.sold.refresh_from_db()
+        self.assertEqual((self.sold.name, self.sold.stock_quantity), ('Vendido 2', 9))
+        self.assertGreater(current_catalog_version(), self.before)
+        self.assertIn(self.sold.pk, build_catalog(self.before)['columns']['id'])
+
+
+class StockAdjustmentTests(TransactionTestCase):
+    """A batch of adjustments is applied whole or not at all"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='bodega', password='x')
+        self.plenty = Product.objects.create(name='Arroz', sku='ARR-1', price=Decimal('3'), stock_quantity=5)
+        self.short = Product.objects.create(name='Azúcar', sku='AZU-1', price=Decimal('2'), stock_quantity=2)
+
+    def stock_levels(self):
+        return dict(Product.objects.values_list('pk', 'stock_quantity'))
+
+    def test_adjustments_apply_together(self):
+        levels = apply_stock_adjustments([
+            {'product': self.plenty.pk, 'delta': -5, 'reason': 'Merma'},
+            {'product': self.plenty.pk, 'delta': 1, 'reason': 'Devolución'},
+            {'product': self.short.pk, 'delta': -2, 'reason': 'Conteo'},
+        ], user=self.user)
+        self.assertEqual(levels, {self.plenty.pk: 1, self.short.pk: 0})
+        self.assertEqual(self.stock_levels(), levels)
+        self.assertEqual(StockAdjustment.objects.count(), 3)
+
+    def test_shortage_rolls_back_every_row(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            apply_stock_adjustments([
+                {'product': self.plenty.pk, 'delta': 3, 'reason': 'Entrega'},
+                {'product': self.short.pk, 'delta': -5, 'reason': 'Merma'},
+            ], user=self.user)
+        self.assertEqual(raised.exception.shortages, {self.short.pk: 2})
+        # The row that had stock to spare is not applied either
+        self.assertEqual(self.stock_levels(), {self.plenty.pk: 5, self.short.pk: 2})
+        self.assertFalse(StockAdjustment.objects.exists())
+
+    def test_api_reports_shortage_as_conflict(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/products/stock-adjustments/', {'adjustments': [
+            {'product': self.plenty.pk, 'delta': -1},
+            {'product': self.short.pk, 'delta': -3},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['available'], {self.short.pk: 2})
+        self.assertEqual(self.stock_levels(), {self.plenty.pk: 5, self.short.pk: 2})
@@ -1,12 +1,17 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, F
+from django.db.models import Q, Case, When, IntegerField
+from django.http import HttpResponse, HttpResponseNotModified
 import logging
 from .models import Product, Category
+from .search import search_product_ids
+from .stock import apply_stock_adjustments, InsufficientStock
+from .catalog import build_catalog, encode_catalog, catalog_etag
+from .importer import import_products, ImportFormatError
 from .serializers import (
     ProductSerializer, ProductCreateUpdateSerializer, ProductListSerializer,
-    CategorySerializer
+    CategorySerializer, StockAdjustmentListSerializer
 )
 
 logger = logging.getLogger(__name__)
@@ -64,9 +69,12 @@ class ProductViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Product.objects.all()
         
-        # Filter by search query
+        # Filter by search query: ranked full-text search, icontains if there is no index
         search = self.request.query_params.get('search', None)
-        if search:
+        ranked_ids = search_product_ids(search) if search else None
+        if ranked_ids is not None:
+            queryset = queryset.filter(pk__in=ranked_ids)
+        elif search:
             queryset = queryset.filter(
                 Q(name__icontains=search) | 
                 Q(sku__icontains=search) |
@@ -91,21 +99,109 @@ class ProductViewSet(viewsets.ModelViewSet):
         # Filter by low stock
         low_stock = self.request.query_params.get('low_stock', None)
         if low_stock and low_stock.lower() == 'true':
-            queryset = queryset.filter(stock_quantity__lte=F('min_stock_level'))
+            queryset = queryset.filter(is_low_stock=True)
         
+        if ranked_ids:
+            return queryset.order_by(Case(
+                *[When(pk=pk, then=position) for position, pk in enumerate(ranked_ids)],
+                output_field=IntegerField()
+            ))
         return queryset.order_by('-created_at', 'name')
     
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         """Get products with low stock"""
         low_stock_products = self.get_queryset().filter(
-            stock_quantity__lte=F('min_stock_level'),
+            is_low_stock=True,
             type='product',
             is_active=True
         )
-        serializer = ProductListSerializer(low_stock_products, many=True)
+        serializer = ProductListSerializer(low_stock_products, many=True, context={'request': request})
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='low_stock/count')
+    def low_stock_count(self, request):
+        """Number of active products with low stock (index-only: products_low_stock_idx)"""
+        count = Product.objects.filter(is_low_stock=True, is_active=True, type='product').count()
+        return Response({'count': count})
+    
+    @action(detail=False, methods=['get'])
+    def catalog(self, request):
+        """Gzip'd columnar catalog snapshot, or only the changes after ?since_version="""
+        since_version = request.query_params.get('since_version')
+        if since_version is not None:
+            try:
+                since_version = int(since_version)
+            except ValueError:
+                return Response(
+                    {'error': 'since_version debe ser un número entero'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        # Taken before the read: a newer body under an older ETag only costs a refetch
+        etag = catalog_etag(since_version)
+        if etag and etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            return HttpResponseNotModified()
+        
+        catalog = build_catalog(since_version)
+        compress = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = HttpResponse(encode_catalog(catalog, compress), content_type='application/json')
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+        if etag:
+            response['ETag'] = etag
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='stock-adjustments')
+    def stock_adjustments(self, request):
+        """Apply many stock adjustments atomically and return the new levels"""
+        rows = request.data.get('adjustments') if isinstance(request.data, dict) else request.data
+        serializer = StockAdjustmentListSerializer(data=rows)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.validated_data:
+            return Response({'error': 'No hay ajustes para aplicar'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            levels = apply_stock_adjustments(serializer.validated_data, user=request.user)
+        except InsufficientStock as e:
+            return Response(
+                {'error': 'No hay suficiente stock disponible', 'available': e.shortages},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({
+            'products': [
+                {'id': product_id, 'stock_quantity': stock_quantity}
+                for product_id, stock_quantity in levels.items()
+            ]
+        })
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """Create/update products from an uploaded CSV or XLSX file, matched by SKU"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Debe adjuntar un archivo en el campo "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            summary = import_products(upload.file, upload.name, user=request.user)
+        except ImportFormatError as e:
+            return Response({'error': f'No se pudo leer el archivo: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        if summary['read_error'] and not summary['rows']:
+            return Response(
+                {'error': f"No se pudo leer el archivo: {summary['read_error']}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        logger.info(
+            "Product import %s: %s created, %s updated, %s errors in %ss",
+            upload.name, summary['created'], summary['updated'], summary['errors'], summary['seconds']
+        )
+        if summary['read_error']:
+            # Rows before the unreadable part are already imported: report them
+            logger.warning("Product import %s stopped after %s rows: %s", upload.name, summary['rows'], summary['read_error'])
+        return Response(summary)
+    
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
         """Update product stock"""
@@ -121,21 +217,24 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if operation == 'add':
-            product.stock_quantity += quantity
-        elif operation == 'subtract':
-            if product.stock_quantity < quantity:
-                return Response(
-                    {'error': 'No hay suficiente stock disponible'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            product.stock_quantity -= quantity
-        else:
+        if operation not in ('add', 'subtract'):
             return Response(
                 {'error': 'Operación debe ser "add" o "subtract"'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        product.save()
+        delta = quantity if operation == 'add' else -quantity
+        try:
+            apply_stock_adjustments(
+                [{'product': product.pk, 'delta': delta, 'reason': request.data.get('reason', '')}],
+                user=request.user
+            )
+        except InsufficientStock:
+            return Response(
+                {'error': 'No hay suficiente stock disponible'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        product.refresh_from_db()
         serializer = ProductSerializer(product)
         return Response(serializer.data)
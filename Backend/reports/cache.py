@@ -0,0 +1,76 @@
+"""
+Caché de resultados de reportes.
+
+Las entradas se guardan bajo la versión actual de los datos; cualquier cambio en
+ventas, productos o transacciones incrementa la versión (ver signals.py) y deja
+las entradas anteriores inalcanzables sin tener que borrarlas.
+"""
+import time
+from django.core.cache import cache
+
+REPORT_CACHE_TIMEOUT = 60 * 60  # 1 hora
+DATA_VERSION_KEY = 'reports:data_version'
+HITS_KEY = 'reports:cache_hits'
+MISSES_KEY = 'reports:cache_misses'
+
+
+def increment(key):
+    """Incrementar un contador del caché, creándolo si no existe"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_data_version():
+    """Versión actual de los datos de reportes"""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # Semilla basada en el reloj: si la clave se pierde nunca se reutiliza una versión anterior
+        cache.add(DATA_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version():
+    """Invalidar todos los reportes cacheados"""
+    if cache.get(DATA_VERSION_KEY) is None:
+        get_data_version()
+    return increment(DATA_VERSION_KEY)
+
+
+def report_cache_key(report_type, params, version):
+    return 'reports:%s:v%s:%s' % (report_type, version, ':'.join(str(p or '') for p in params))
+
+
+def get_or_build_report(report_type, params, builder, timeout=REPORT_CACHE_TIMEOUT):
+    """
+    Devolver los datos del reporte desde el caché o calcularlos con builder().
+    params identifica la consulta (p. ej. el rango de fechas); el formato de
+    salida se aplica después, así que json/csv/excel comparten la misma entrada.
+    """
+    version = get_data_version()
+    key = report_cache_key(report_type, params, version)
+    report_data = cache.get(key)
+    if report_data is not None:
+        increment(HITS_KEY)
+        return report_data
+
+    increment(MISSES_KEY)
+    report_data = builder()
+    cache.set(key, report_data, timeout)
+    return report_data
+
+
+def get_report_cache_stats():
+    """Contadores de aciertos y fallos del caché de reportes"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+        'data_version': get_data_version(),
+    }
@@ -0,0 +1,68 @@
+"""
+GET condicional (ETag / Last-Modified) para reportes y estadísticas.
+
+La huella de los datos es, por cada tabla fuente, el último updated_at y el
+número de filas (el conteo detecta los borrados, que no tocan updated_at). Un
+reporte debe declarar todas las tablas que lee, incluidas las de detalle como
+SaleItem: si falta una, sus cambios no alteran el ETag y se sirve un 304 viejo. Se
+calcula con una sola consulta UNION, así que un refresco sin cambios cuesta
+esa consulta y una respuesta 304 sin cuerpo.
+"""
+import hashlib
+from django.db.models import Count, Max, Value, CharField
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+FINGERPRINT_ATTR = '_data_fingerprint'
+
+
+def data_fingerprint(models):
+    """Filas (tabla, último updated_at, conteo) de las tablas indicadas"""
+    querysets = [
+        model.objects.order_by().annotate(
+            source=Value(model._meta.db_table, output_field=CharField())
+        ).values('source').annotate(
+            last_updated=Max('updated_at'),
+            row_count=Count('pk')
+        ).values_list('source', 'last_updated', 'row_count')
+        for model in models
+    ]
+    queryset = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+    return sorted(queryset)
+
+
+def request_fingerprint(request, models):
+    """Huella de los datos, calculada una sola vez por petición"""
+    cached = getattr(request, FINGERPRINT_ATTR, None)
+    if cached is None:
+        cached = data_fingerprint(models)
+        setattr(request, FINGERPRINT_ATTR, cached)
+    return cached
+
+
+def conditional_on(*models):
+    """
+    Decorador para vistas GET cuya respuesta depende solo de las tablas dadas.
+    El ETag incluye la URL completa (filtros, formato) y la fecha actual, ya
+    que varias estadísticas dependen del mes en curso.
+    """
+    def etag(request, *args, **kwargs):
+        digest = hashlib.sha1()
+        digest.update(request.get_full_path().encode())
+        digest.update(request.META.get('HTTP_ACCEPT', '').encode())
+        digest.update(timezone.localdate().isoformat().encode())
+        for row in request_fingerprint(request, models):
+            digest.update(repr(row).encode())
+        return '"%s"' % digest.hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        dates = [row[1] for row in request_fingerprint(request, models) if row[1] is not None]
+        return max(dates) if dates else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def conditional_action(*models):
+    """conditional_on para métodos de ViewSet (acciones de DRF)"""
+    return method_decorator(conditional_on(*models))
@@ -0,0 +1,165 @@
+"""
+Exportación tipada en formatos columnares (Apache Parquet y Arrow IPC).
+
+Las filas se leen con cursores del servidor y se escriben en lotes, de modo que
+cada lote se convierte en un row group (Parquet) o record batch (Arrow) y la
+memoria no depende del tamaño de la tabla. Los tipos se derivan del modelo:
+Decimal -> decimal128, DateTime -> timestamp UTC, Date -> date32.
+"""
+import tempfile
+from itertools import islice
+from django.http import FileResponse
+from django.utils import timezone
+from sales.models import Sale, SaleItem
+from finances.models import Transaction
+
+# Importación condicional de pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARROW_BATCH_SIZE = 50000
+
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Tablas exportables: modelo, columnas y campo de fecha para filtrar
+EXPORT_TABLES = {
+    'sales': {
+        'model': Sale,
+        'columns': [
+            'id', 'sale_number', 'customer_id', 'sale_date', 'payment_method', 'status',
+            'subtotal', 'tax_amount', 'discount_amount', 'total_amount',
+            'created_by_id', 'created_at', 'updated_at'
+        ],
+        'date_field': 'created_at',
+    },
+    'sale_items': {
+        'model': SaleItem,
+        'columns': ['id', 'sale_id', 'product_id', 'quantity', 'unit_price', 'total_price', 'sale__created_at'],
+        'date_field': 'sale__created_at',
+    },
+    'transactions': {
+        'model': Transaction,
+        'columns': [
+            'id', 'transaction_type', 'description', 'amount', 'payment_method',
+            'category_id', 'transaction_date', 'receipt_number', 'created_by_id',
+            'created_at', 'updated_at'
+        ],
+        'date_field': 'transaction_date',
+    },
+}
+
+
+def resolve_field(model, path):
+    """Campo del modelo al que apunta un lookup como 'sale__customer__name'"""
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    name = parts[-1]
+    for field in model._meta.concrete_fields:
+        if name in (field.name, field.attname):
+            return field
+    return model._meta.get_field(name)
+
+
+def arrow_type(field):
+    """Tipo Arrow equivalente a un campo de Django"""
+    internal_type = field.get_internal_type()
+    if internal_type in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+                         'SmallIntegerField', 'PositiveIntegerField', 'ForeignKey'):
+        return pa.int64()
+    if internal_type == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    if internal_type == 'DateField':
+        return pa.date32()
+    if internal_type == 'BooleanField':
+        return pa.bool_()
+    if internal_type in ('FloatField',):
+        return pa.float64()
+    return pa.string()
+
+
+def arrow_schema(model, columns, names=None):
+    return pa.schema([
+        pa.field(name, arrow_type(resolve_field(model, column)))
+        for name, column in zip(names or columns, columns)
+    ])
+
+
+def open_writer(output, schema, file_format):
+    if file_format == 'parquet':
+        return pq.ParquetWriter(output, schema, compression='zstd')
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    return pa.ipc.new_file(output, schema, options=options)
+
+
+def write_row_batches(rows, schema, output, file_format):
+    """Escribir un iterador de tuplas en lotes de ARROW_BATCH_SIZE filas"""
+    writer = open_writer(output, schema, file_format)
+    try:
+        rows = iter(rows)
+        while True:
+            batch_rows = list(islice(rows, ARROW_BATCH_SIZE))
+            if not batch_rows:
+                break
+            columns = zip(*batch_rows)
+            batch = pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            if file_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+    finally:
+        writer.close()
+
+
+def write_queryset(queryset, columns, output, file_format, names=None):
+    """Exportar las columnas de un queryset leyendo con cursor del servidor"""
+    schema = arrow_schema(queryset.model, columns, names)
+    rows = queryset.values_list(*columns).iterator(chunk_size=ARROW_BATCH_SIZE)
+    write_row_batches(rows, schema, output, file_format)
+
+
+def write_records(records, output, file_format):
+    """Exportar una lista de dicts (secciones de reportes) infiriendo los tipos"""
+    table = pa.Table.from_pylist(records)
+    writer = open_writer(output, table.schema, file_format)
+    try:
+        writer.write_table(table)
+    finally:
+        writer.close()
+
+
+def columnar_file_response(write, filename, file_format):
+    """Escribir en un archivo temporal con write(output) y servirlo"""
+    extension, content_type = COLUMNAR_FORMATS[file_format]
+    output = tempfile.TemporaryFile()
+    write(output)
+    output.seek(0)
+    response = FileResponse(output, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.now().strftime("%Y%m%d")}.{extension}"'
+    return response
+
+
+def queryset_columnar_response(queryset, columns, filename, file_format, names=None):
+    return columnar_file_response(
+        lambda output: write_queryset(queryset, columns, output, file_format, names),
+        filename, file_format
+    )
+
+
+def records_columnar_response(records, filename, file_format):
+    return columnar_file_response(
+        lambda output: write_records(records, output, file_format),
+        filename, file_format
+    )
@@ -0,0 +1,176 @@
+"""
+Generación asíncrona de reportes.
+
+Los trabajos se ejecutan en un pool local de hilos: la petición HTTP solo crea el
+registro Report y el archivo resultante se guarda en MEDIA_ROOT/reports/.
+
+El pool vive en el proceso web, así que un reinicio o una caída del worker pierde
+sus trabajos. Mientras un proceso tiene trabajos en cola o en curso, un hilo les
+actualiza heartbeat_at cada REPORT_JOB_HEARTBEAT segundos; fail_stale_jobs() marca
+como fallidos los que llevan más de REPORT_JOB_STALE_AFTER segundos sin latido, en
+vez de dejarlos 'pending' o 'running' para siempre.
+"""
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Report
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'REPORT_JOB_WORKERS', 2),
+    thread_name_prefix='report-job'
+)
+
+# Tipos de Report que se pueden generar como trabajo
+JOB_REPORT_TYPES = ['sales', 'inventory', 'finances', 'customers']
+
+# Filtros (Report.filters) que acepta cada tipo, con el nombre del parámetro del
+# endpoint síncrono; ReportJobSerializer rechaza los demás
+JOB_REPORT_FILTERS = {
+    'sales': ['start_date', 'end_date'],
+    'inventory': [],
+    'finances': ['start_date', 'end_date'],
+    'customers': ['start_date', 'end_date'],
+}
+
+ACTIVE_STATUSES = ['pending', 'running']
+STALE_JOB_MESSAGE = 'El proceso que generaba el reporte se detuvo antes de terminar'
+
+_heartbeat_lock = threading.Lock()
+# Trabajos en cola o en curso en este proceso y el hilo que les da latido
+_heartbeat = {'pid': None, 'report_ids': set(), 'thread': None}
+
+
+def own_jobs():
+    """Trabajos de este proceso (un worker creado con fork no hereda los del padre)"""
+    if _heartbeat['pid'] != os.getpid():
+        _heartbeat.update(pid=os.getpid(), report_ids=set(), thread=None)
+    return _heartbeat['report_ids']
+
+
+def touch_jobs():
+    """Actualizar heartbeat_at de los trabajos de este proceso"""
+    with _heartbeat_lock:
+        report_ids = list(own_jobs())
+    if report_ids:
+        Report.objects.filter(pk__in=report_ids, status__in=ACTIVE_STATUSES).update(
+            heartbeat_at=timezone.now()
+        )
+
+
+def beat():
+    """Dar latido a los trabajos de este proceso cada REPORT_JOB_HEARTBEAT segundos"""
+    while True:
+        time.sleep(settings.REPORT_JOB_HEARTBEAT)
+        close_old_connections()
+        try:
+            touch_jobs()
+        except Exception:
+            logger.exception("Error registrando el latido de los reportes")
+        finally:
+            close_old_connections()
+
+
+def keep_alive(report_id):
+    """Dar latido al trabajo mientras siga en este proceso"""
+    with _heartbeat_lock:
+        own_jobs().add(report_id)
+        thread = _heartbeat['thread']
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=beat, name='report-job-heartbeat', daemon=True)
+            thread.start()
+            _heartbeat['thread'] = thread
+
+
+def forget(report_id):
+    with _heartbeat_lock:
+        own_jobs().discard(report_id)
+
+
+def fail_stale_jobs():
+    """Marcar como fallidos los trabajos activos sin latido reciente; devuelve cuántos"""
+    cutoff = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_AFTER)
+    # Un trabajo que nunca llegó al pool (el proceso cayó antes) no tiene latido
+    stale = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, created_at__lt=cutoff)
+    return Report.objects.filter(stale, status__in=ACTIVE_STATUSES).update(
+        status='failed', error_message=STALE_JOB_MESSAGE
+    )
+
+
+def get_report_builder(report):
+    """Función que calcula los datos del reporte según su tipo"""
+    from .views import (
+        build_sales_report_data, build_inventory_report_data,
+        build_financial_report_data, build_customer_report_data
+    )
+
+    start_date = report.start_date.strftime('%Y-%m-%d') if report.start_date else None
+    end_date = report.end_date.strftime('%Y-%m-%d') if report.end_date else None
+    builders = {
+        'sales': lambda: build_sales_report_data(start_date, end_date),
+        'inventory': build_inventory_report_data,
+        'finances': lambda: build_financial_report_data(start_date, end_date),
+        'customers': lambda: build_customer_report_data(start_date, end_date),
+    }
+    return builders[report.report_type]
+
+
+def render_report_file(report, data):
+    """Escribir el artefacto del reporte en un archivo temporal (binario)"""
+    from .views import write_csv_report, write_xlsxwriter_report, XLSXWRITER_AVAILABLE
+
+    output = tempfile.TemporaryFile()
+    if report.output_format == 'excel':
+        if not XLSXWRITER_AVAILABLE:
+            raise RuntimeError('xlsxwriter no está disponible para generar Excel')
+        write_xlsxwriter_report(data, output)
+    else:
+        text_output = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        write_csv_report(data, text_output)
+        text_output.flush()
+        text_output.detach()
+    output.seek(0)
+    return output
+
+
+def run_report_job(report_id):
+    """Generar el archivo de un Report pendiente"""
+    close_old_connections()
+    try:
+        Report.objects.filter(pk=report_id).update(status='running', heartbeat_at=timezone.now())
+        report = Report.objects.get(pk=report_id)
+
+        data = get_report_builder(report)()
+        extension = 'xlsx' if report.output_format == 'excel' else 'csv'
+        filename = f"{report.report_type}_{report.pk}_{timezone.now().strftime('%Y%m%d%H%M%S')}.{extension}"
+
+        with render_report_file(report, data) as output:
+            report.file_path.save(filename, File(output), save=False)
+        report.status = 'completed'
+        report.completed_at = timezone.now()
+        report.save(update_fields=['file_path', 'status', 'completed_at'])
+    except Exception as e:
+        logger.exception(f"Error generando reporte {report_id}")
+        Report.objects.filter(pk=report_id).update(status='failed', error_message=str(e))
+    finally:
+        forget(report_id)
+        close_old_connections()
+
+
+def submit_report_job(report):
+    """Encolar la generación del reporte cuando la transacción actual confirme"""
+    def submit():
+        keep_alive(report.pk)
+        executor.submit(run_report_job, report.pk)
+    transaction.on_commit(submit)
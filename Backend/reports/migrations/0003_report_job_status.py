@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='output_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel')], default='csv', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_report_job_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
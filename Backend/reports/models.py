@@ -16,6 +16,18 @@ class Report(models.Model):
         ('inventory', 'Reporte de Inventario'),
     ]
     
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+    ]
+    
     name = models.CharField(max_length=200)
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES)
     description = models.TextField(blank=True)
@@ -24,6 +36,12 @@ class Report(models.Model):
     filters = models.JSONField(default=dict, blank=True)
     file_path = models.FileField(upload_to='reports/', blank=True, null=True)
     is_scheduled = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    output_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    error_message = models.TextField(blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # Último latido del proceso que tiene el trabajo en cola o en curso (reports.jobs)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
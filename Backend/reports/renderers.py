@@ -0,0 +1,36 @@
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+
+
+class CSVFormatRenderer(JSONRenderer):
+    """
+    Acepta ?format=csv en la negociación de DRF.
+    La vista devuelve el archivo directamente; los errores se siguen enviando en JSON.
+    """
+    format = 'csv'
+
+
+class ExcelFormatRenderer(JSONRenderer):
+    """
+    Acepta ?format=excel en la negociación de DRF.
+    """
+    format = 'excel'
+
+
+class ParquetFormatRenderer(JSONRenderer):
+    """
+    Acepta ?format=parquet en la negociación de DRF.
+    """
+    format = 'parquet'
+
+
+class ArrowFormatRenderer(JSONRenderer):
+    """
+    Acepta ?format=arrow en la negociación de DRF.
+    """
+    format = 'arrow'
+
+
+REPORT_RENDERERS = [
+    JSONRenderer, BrowsableAPIRenderer, CSVFormatRenderer, ExcelFormatRenderer,
+    ParquetFormatRenderer, ArrowFormatRenderer
+]
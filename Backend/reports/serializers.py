@@ -0,0 +1,65 @@
+from django.utils import timezone
+from rest_framework import serializers
+from .models import Report
+from .jobs import JOB_REPORT_TYPES, JOB_REPORT_FILTERS
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Report
+        fields = [
+            'id', 'name', 'report_type', 'description', 'start_date', 'end_date',
+            'filters', 'output_format', 'status', 'error_message', 'download_url',
+            'created_at', 'completed_at'
+        ]
+        read_only_fields = ['id', 'status', 'error_message', 'created_at', 'completed_at']
+        extra_kwargs = {'name': {'required': False}}
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        request = self.context.get('request')
+        url = f'/api/reports/jobs/{obj.pk}/download/'
+        return request.build_absolute_uri(url) if request else url
+
+    def validate_report_type(self, value):
+        if value not in JOB_REPORT_TYPES:
+            raise serializers.ValidationError(f"Tipo de reporte no soportado: {value}")
+        return value
+
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Los filtros deben ser un objeto")
+        return value
+
+    def apply_filters(self, attrs):
+        """Pasar el rango de fechas de filters a start_date/end_date, que usa el builder"""
+        filters = attrs.get('filters') or {}
+        supported = JOB_REPORT_FILTERS[attrs['report_type']]
+        unsupported = sorted(set(filters) - set(supported))
+        if unsupported:
+            raise serializers.ValidationError({
+                'filters': [f"Filtros no soportados para este reporte: {', '.join(unsupported)}"]
+            })
+        for name in supported:
+            if filters.get(name) in (None, ''):
+                continue
+            try:
+                value = serializers.DateField().run_validation(filters[name])
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({'filters': {name: e.detail}})
+            if attrs.get(name) and attrs[name] != value:
+                raise serializers.ValidationError({'filters': {name: ["No coincide con el campo del mismo nombre"]}})
+            attrs[name] = value
+
+    def validate(self, attrs):
+        self.apply_filters(attrs)
+        start_date = attrs.get('start_date')
+        end_date = attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError("La fecha inicial debe ser anterior a la final")
+        if not attrs.get('name'):
+            attrs['name'] = f"{dict(Report.REPORT_TYPES)[attrs['report_type']]} {timezone.now().strftime('%Y-%m-%d %H:%M')}"
+        return attrs
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from sales.models import Sale, SaleItem
+from products.models import Product
+from finances.models import Transaction
+from customers.models import Customer
+from .cache import bump_data_version
+
+
+def invalidate_report_cache(sender, **kwargs):
+    # Tras el commit: si se incrementa antes, una petición concurrente podría
+    # reconstruir el reporte sin los cambios y cachearlo bajo la nueva versión
+    transaction.on_commit(bump_data_version)
+
+
+for model in (Sale, SaleItem, Product, Transaction, Customer):
+    post_save.connect(invalidate_report_cache, sender=model, dispatch_uid=f'reports_cache_{model.__name__}_save')
+    post_delete.connect(invalidate_report_cache, sender=model, dispatch_uid=f'reports_cache_{model.__name__}_delete')
@@ -1,3 +1,229 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate, TruncMonth
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from sales.models import Sale, SaleItem
+from products.models import Product
+from finances.models import Transaction
+from .models import Report
+from . import jobs
+from .views import sales_date_filters, transaction_date_filters
 
-# Create your tests here.
+
+class ReportQueryPlanTests(TestCase):
+    """
+    Las consultas de reportes por rango de fechas deben resolverse con búsquedas
+    por índice (SEARCH en SQLite, Index Scan en PostgreSQL), no con recorridos completos.
+    """
+
+    def assertIndexRangeScan(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # Con tablas de prueba casi vacías el planificador prefiere Seq Scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            self.assertRegex(queryset.explain(), rf'Index (Only )?Scan (using|on) {index_name}')
+        elif connection.vendor == 'sqlite':
+            self.assertRegex(queryset.explain(), rf'SEARCH \w+ USING (COVERING )?INDEX {index_name}')
+        else:
+            self.skipTest(f'Sin verificación de planes para {connection.vendor}')
+
+    def test_daily_sales_uses_created_at_index(self):
+        sales = Sale.objects.filter(**sales_date_filters('2025-01-01', '2025-12-31'))
+        daily = sales.annotate(day=TruncDate('created_at')).values('day').annotate(
+            daily_total=Sum('total_amount'),
+            daily_count=Count('id')
+        ).order_by('day')
+        # Ambos índices empiezan por created_at; el planificador elige cualquiera
+        self.assertIndexRangeScan(daily, 'sales_created_(status|id)_idx')
+
+    def test_sale_items_use_sale_product_index(self):
+        items = SaleItem.objects.filter(sale_id__in=[1, 2, 3]).values('product_id').annotate(
+            total_quantity=Sum('quantity')
+        )
+        self.assertIndexRangeScan(items, 'sale_items_sale_product_idx')
+
+    def test_monthly_transactions_use_type_date_index(self):
+        transactions = Transaction.objects.filter(
+            transaction_type='expense',
+            **transaction_date_filters('2025-01-01', '2025-12-31')
+        )
+        monthly = transactions.annotate(month=TruncMonth('transaction_date')).values('month').annotate(
+            total_amount=Sum('amount')
+        ).order_by('month')
+        self.assertIndexRangeScan(monthly, 'transactions_type_date_idx')
+
+    def test_trunc_functions_replace_raw_sql(self):
+        Transaction.objects.create(
+            transaction_type='income', description='Venta', amount=100,
+            transaction_date=date(2025, 3, 15)
+        )
+        month = Transaction.objects.annotate(month=TruncMonth('transaction_date')).values_list('month', flat=True)
+        self.assertEqual(month.get().strftime('%Y-%m'), '2025-03')
+
+
+class ReportPermissionTests(TestCase):
+    """Los reportes con datos exigen autenticación; solo el listado de tipos es público"""
+
+    PROTECTED_URLS = [
+        '/api/reports/sales/',
+        '/api/reports/sales/?detail=lines&format=csv',
+        '/api/reports/inventory/',
+        '/api/reports/financial/',
+        '/api/reports/customers/',
+        '/api/reports/bundle/?types=sales,customers',
+        '/api/reports/export/sales/',
+        '/api/reports/cache-stats/',
+        '/api/reports/jobs/',
+    ]
+
+    # SessionAuthentication va primero en DEFAULT_AUTHENTICATION_CLASSES y no define
+    # WWW-Authenticate, así que DRF responde 403 (no 401) a credenciales ausentes o inválidas
+    def test_anonymous_requests_are_rejected(self):
+        client = APIClient()
+        for url in self.PROTECTED_URLS:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 403)
+                self.assertEqual(response.data['detail'].code, 'not_authenticated')
+
+    def test_invalid_token_is_rejected(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token invalido')
+        for url in self.PROTECTED_URLS:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 403)
+                self.assertEqual(response.data['detail'].code, 'authentication_failed')
+
+    def test_authenticated_requests_are_served(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='reportes', password='x'))
+        for url in self.PROTECTED_URLS:
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 200)
+
+    def test_report_types_are_public(self):
+        self.assertEqual(APIClient().get('/api/reports/types/').status_code, 200)
+
+
+class ReportConditionalTests(TestCase):
+    """El ETag de los reportes que leen líneas de venta cambia al editar o agregar líneas"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='etag', password='x'))
+        self.product = Product.objects.create(name='Cable', sku='CAB-1', price=Decimal('5'), stock_quantity=100)
+        self.sale = Sale.objects.create(total_amount=Decimal('10'), status='completed')
+        self.item = SaleItem.objects.create(sale=self.sale, product=self.product, quantity=2, unit_price=Decimal('5'))
+
+    def assertETagChanges(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def edit_line(self):
+        self.item.quantity = 3
+        self.item.save()
+
+    def add_line(self):
+        SaleItem.objects.create(sale=self.sale, product=self.product, quantity=1, unit_price=Decimal('5'))
+
+    def test_sales_report_etag_follows_line_edits(self):
+        self.assertETagChanges('/api/reports/sales/', self.edit_line)
+        self.assertETagChanges('/api/reports/sales/?detail=lines&format=csv', self.add_line)
+
+    def test_bundle_etag_follows_line_edits(self):
+        self.assertETagChanges('/api/reports/bundle/?types=sales', self.edit_line)
+
+
+class ReportJobTests(TransactionTestCase):
+    """Un trabajo termina completado o fallido, también si su proceso desaparece"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = get_user_model().objects.create_user(username='analista', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # El pool ejecuta el trabajo en el mismo hilo, al confirmar la petición
+        inline = mock.patch.object(jobs.executor, 'submit', side_effect=lambda fn, *args: fn(*args))
+        inline.start()
+        self.addCleanup(inline.stop)
+
+    def create_job(self, **data):
+        response = self.client.post('/api/reports/jobs/', {'report_type': 'sales', **data}, format='json')
+        self.assertEqual(response.status_code, 202)
+        return self.client.get(f"/api/reports/jobs/{response.data['id']}/").data
+
+    def test_filters_reach_the_builder(self):
+        with mock.patch('reports.views.build_sales_report_data', return_value={}) as build:
+            job = self.create_job(filters={'start_date': '2025-01-01', 'end_date': '2025-01-31'})
+        self.assertEqual(job['status'], 'completed')
+        build.assert_called_once_with('2025-01-01', '2025-01-31')
+        self.assertEqual((job['start_date'], job['end_date']), ('2025-01-01', '2025-01-31'))
+
+    def test_unsupported_filters_are_rejected(self):
+        for report_type, filters in [('sales', {'category': 3}), ('inventory', {'start_date': '2025-01-01'}),
+                                     ('sales', {'start_date': 'enero'})]:
+            response = self.client.post('/api/reports/jobs/', {'report_type': report_type, 'filters': filters}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('filters', response.data)
+        self.assertFalse(Report.objects.exists())
+
+    def stale_job(self, status, **fields):
+        report = Report.objects.create(name='Perdido', report_type='sales', status=status, created_by=self.user)
+        Report.objects.filter(pk=report.pk).update(**fields)
+        return report.pk
+
+    def test_job_completes(self):
+        job = self.create_job(output_format='csv')
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(self.client.get(f"/api/reports/jobs/{job['id']}/download/").status_code, 200)
+
+    def test_failed_build_is_reported(self):
+        with mock.patch.object(jobs, 'get_report_builder', side_effect=RuntimeError('sin datos')):
+            job = self.create_job()
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error_message'], 'sin datos')
+        self.assertEqual(self.client.get(f"/api/reports/jobs/{job['id']}/download/").status_code, 409)
+        self.assertEqual(jobs.own_jobs(), set())
+
+    @override_settings(REPORT_JOB_STALE_AFTER=60)
+    def test_jobs_without_heartbeat_are_failed(self):
+        long_ago = timezone.now() - timedelta(minutes=5)
+        running = self.stale_job('running', heartbeat_at=long_ago)
+        never_started = self.stale_job('pending', created_at=long_ago)
+        alive = self.stale_job('running', heartbeat_at=timezone.now())
+        queued = self.stale_job('pending')
+
+        jobs_by_id = {job['id']: job for job in self.client.get('/api/reports/jobs/').data['results']}
+        self.assertEqual(jobs_by_id[running]['status'], 'failed')
+        self.assertEqual(jobs_by_id[running]['error_message'], jobs.STALE_JOB_MESSAGE)
+        self.assertEqual(jobs_by_id[never_started]['status'], 'failed')
+        self.assertEqual(jobs_by_id[alive]['status'], 'running')
+        self.assertEqual(jobs_by_id[queued]['status'], 'pending')
+
+    @override_settings(REPORT_JOB_STALE_AFTER=60)
+    def test_heartbeat_keeps_job_alive(self):
+        report_id = self.stale_job('running', heartbeat_at=timezone.now() - timedelta(minutes=5))
+        jobs.keep_alive(report_id)
+        self.addCleanup(jobs.forget, report_id)
+        # Lo que hace el hilo del latido en cada vuelta
+        jobs.touch_jobs()
+        self.assertEqual(jobs.fail_stale_jobs(), 0)
+        self.assertEqual(Report.objects.get(pk=report_id).status, 'running')
@@ -1,9 +1,18 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
 from . import views
 
+router = DefaultRouter()
+router.register(r'jobs', views.ReportJobViewSet, basename='report-job')
+
 urlpatterns = [
     path('sales/', views.generate_sales_report, name='sales_report'),
     path('inventory/', views.generate_inventory_report, name='inventory_report'),
     path('financial/', views.generate_financial_report, name='financial_report'),
+    path('customers/', views.generate_customer_report, name='customer_report'),
+    path('bundle/', views.generate_report_bundle, name='report_bundle'),
     path('types/', views.get_report_types, name='report_types'),
+    path('cache-stats/', views.report_cache_stats, name='report_cache_stats'),
+    path('export/<str:table>/', views.export_table, name='export_table'),
+    path('', include(router.urls)),
 ]
@@ -1,20 +1,36 @@
 
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Sum, Count, F, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse
+from django.db import connection, transaction
+from django.db.models import Sum, Count, F, Q, Min, Max
+from django.db.models import FloatField, CharField
+from django.db.models.functions import TruncDate, TruncMonth, Cast
 from django.utils import timezone
 from datetime import datetime, timedelta
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, viewsets, mixins
 import io
 import csv
-from sales.models import Sale, SaleItem
+import tempfile
+import os
+import time
+from sales.models import Sale, SaleItem, SalesDailyRollup
+from sales.rollup import sales_rollup_ready
 from products.models import Product
 from customers.models import Customer
 from finances.models import Transaction
 from .models import Report
+from .renderers import REPORT_RENDERERS
+from .cache import get_or_build_report, get_report_cache_stats
+from .conditional import conditional_on
+from .serializers import ReportJobSerializer
+from .jobs import submit_report_job, fail_stale_jobs
+from .exports import (
+    PYARROW_AVAILABLE, COLUMNAR_FORMATS, EXPORT_TABLES,
+    queryset_columnar_response, records_columnar_response
+)
 import json
 
 # Importación condicional de openpyxl
@@ -25,6 +41,27 @@ try:
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
+# Importación condicional de xlsxwriter (motor Excel de memoria constante)
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+# Importación condicional de numpy (conversión vectorizada de series)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Series que admiten layout=columnar
+COLUMNAR_SERIES = ['daily_sales', 'monthly_data', 'category_breakdown']
+
+# Todo endpoint que devuelve datos de ventas, clientes, inventario o finanzas exige
+# autenticación (solo el listado de tipos de reporte es público)
+REPORT_PERMISSIONS = [IsAuthenticated]
+
 
 
 
@@ -61,9 +98,233 @@ def get_report_types(request):
     return Response(report_types)
 
 
+@api_view(['GET'])
+@permission_classes(REPORT_PERMISSIONS)
+def report_cache_stats(request):
+    """Estadísticas del caché de reportes"""
+    return Response(get_report_cache_stats())
+
+
+
+class ReportJobViewSet(mixins.CreateModelMixin,
+                       mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Trabajos de generación de reportes en segundo plano
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = REPORT_PERMISSIONS
+    queryset = Report.objects.all()
+
+    def get_queryset(self):
+        # Los trabajos de un proceso reiniciado no terminarán: se informan como fallidos
+        fail_stale_jobs()
+        queryset = Report.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        status_filter = self.request.query_params.get('status', None)
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """Registrar el reporte y encolar su generación"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report = serializer.save(created_by=request.user, status='pending')
+        submit_report_job(report)
+        return Response(self.get_serializer(report).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Descargar el archivo generado"""
+        report = self.get_object()
+        if report.status != 'completed' or not report.file_path:
+            return Response(
+                {'error': 'El reporte aún no está disponible', 'status': report.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            report.file_path.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(report.file_path.name)
+        )
+
+
+def sales_date_filters(start_date, end_date):
+    """Filtros de fecha sobre Sale.created_at"""
+    filter_kwargs = {}
+    if start_date:
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        filter_kwargs['created_at__gte'] = timezone.make_aware(start_dt, timezone.get_current_timezone())
+    if end_date:
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+        filter_kwargs['created_at__lte'] = timezone.make_aware(end_dt, timezone.get_current_timezone())
+    return filter_kwargs
+
+
+def sales_report_querysets(start_date, end_date):
+    """Consultas del reporte de ventas sobre las tablas de ventas"""
+    filter_kwargs = sales_date_filters(start_date, end_date)
+    
+    # Obtener datos de ventas
+    sales = Sale.objects.filter(**filter_kwargs).select_related('customer').order_by('-created_at')
+    
+    # Datos por producto
+    products_data = SaleItem.objects.filter(
+        sale__in=sales
+    ).values(
+        'product__name', 'product__sku'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('unit_price')),
+        sales_count=Count('sale', distinct=True)
+    ).order_by('-total_revenue')
+    
+    # Datos por cliente
+    customers_data = sales.values(
+        'customer__name', 'customer__email'
+    ).annotate(
+        total_spent=Sum('total_amount'),
+        purchase_count=Count('id')
+    ).order_by('-total_spent')
+    
+    # Datos por día
+    daily_sales = sales.annotate(
+        day=TruncDate('created_at')
+    ).values('day').annotate(
+        daily_total=Sum('total_amount'),
+        daily_count=Count('id')
+    ).order_by('day')
+    
+    return products_data, customers_data, daily_sales
+
+
+def sales_report_querysets_from_rollup(start_date, end_date):
+    """Consultas del reporte de ventas sobre SalesDailyRollup (una fila por día, no por venta)"""
+    # Cubetas vaciadas por ediciones o borrados no cuentan como filas del reporte
+    rollup = SalesDailyRollup.objects.filter(sale_count__gt=0)
+    if start_date:
+        rollup = rollup.filter(day__gte=datetime.strptime(start_date, '%Y-%m-%d').date())
+    if end_date:
+        rollup = rollup.filter(day__lte=datetime.strptime(end_date, '%Y-%m-%d').date())
+    
+    # Filas a nivel de venta (product NULL) y filas por producto
+    sale_rows = rollup.filter(product__isnull=True)
+    product_rows = rollup.filter(product__isnull=False)
+    
+    products_data = product_rows.values(
+        'product__name', 'product__sku'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('revenue'),
+        sales_count=Sum('sale_count')
+    ).order_by('-total_revenue')
+    
+    customers_data = sale_rows.values(
+        'customer__name', 'customer__email'
+    ).annotate(
+        total_spent=Sum('total_amount'),
+        purchase_count=Sum('sale_count')
+    ).order_by('-total_spent')
+    
+    daily_sales = sale_rows.values('day').annotate(
+        daily_total=Sum('total_amount'),
+        daily_count=Sum('sale_count')
+    ).order_by('day')
+    
+    return products_data, customers_data, daily_sales
+
+
+def customer_sale_totals(start_date, end_date):
+    """
+    Compras del período por cliente, en una sola consulta agrupada sobre Sale:
+    {customer_id: (total_spent, purchase_count, frequency, monetary, first_purchase, last_purchase)}.
+    total_spent/purchase_count cuentan todas las ventas (reporte de ventas); el resto
+    excluye las canceladas (RFM del reporte de clientes). El bundle la calcula una
+    vez para ambas secciones.
+    """
+    valid = ~Q(status='cancelled')
+    rows = Sale.objects.filter(**sales_date_filters(start_date, end_date)).order_by().values_list(
+        'customer_id'
+    ).annotate(
+        total_spent=Cast(Sum('total_amount'), FloatField()),
+        purchase_count=Count('id'),
+        frequency=Count('id', filter=valid),
+        monetary=Cast(Sum('total_amount', filter=valid), FloatField()),
+        first_purchase=Cast(Min('created_at', filter=valid), CharField()),
+        last_purchase=Cast(Max('created_at', filter=valid), CharField())
+    )
+    return {row[0]: row[1:] for row in rows}
+
+
+def top_customers_from_totals(customer_totals, limit=10):
+    """Filas top_customers del reporte de ventas a partir de customer_sale_totals()"""
+    top = sorted(customer_totals.items(), key=lambda item: -(item[1][0] or 0))[:limit]
+    customers = Customer.objects.only('name', 'email').in_bulk([customer_id for customer_id, _ in top if customer_id])
+    rows = []
+    for customer_id, totals in top:
+        customer = customers.get(customer_id)
+        rows.append({
+            'customer__name': customer.name if customer else None,
+            'customer__email': customer.email if customer else None,
+            'total_spent': totals[0],
+            'purchase_count': totals[1],
+        })
+    return rows
+
+
+def build_sales_report_data(start_date, end_date, customer_totals=None):
+    """
+    Calcular los datos del reporte de ventas. customer_totals (una función que
+    devuelve customer_sale_totals()) reemplaza la consulta por cliente.
+    """
+    if sales_rollup_ready():
+        querysets = sales_report_querysets_from_rollup(start_date, end_date)
+    else:
+        querysets = sales_report_querysets(start_date, end_date)
+    products_data, customers_data, daily_sales = querysets
+    if customer_totals is not None:
+        customers_data = top_customers_from_totals(customer_totals())
+    
+    # Los totales del período salen de la serie diaria, sin otra consulta
+    daily_sales = list(daily_sales)
+    total_sales = {
+        'total_amount': sum(day['daily_total'] or 0 for day in daily_sales),
+        'total_count': sum(day['daily_count'] or 0 for day in daily_sales),
+    }
+    
+    # Serializar los valores numéricos: una conversión vectorizada por columna
+    top_products = numeric_rows(products_data[:10], ['total_quantity', 'total_revenue', 'sales_count'])
+    top_customers = numeric_rows(customers_data[:10], ['total_spent', 'purchase_count'])
+    daily_sales_serialized = numeric_rows(daily_sales, ['daily_total', 'daily_count'])
+    for day in daily_sales_serialized:
+        if not isinstance(day['day'], str):
+            day['day'] = day['day'].isoformat()
+
+    report_data = {
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'summary': {
+            'total_amount': float(total_sales['total_amount'] or 0),
+            'total_sales': total_sales['total_count'],
+            'average_sale': float((total_sales['total_amount'] or 0) / max(total_sales['total_count'], 1))
+        },
+        'top_products': top_products,
+        'top_customers': top_customers,
+        'daily_sales': daily_sales_serialized,
+        'generated_at': timezone.now().isoformat()
+    }
+    return report_data
+
 
 @api_view(['GET'])
-@permission_classes([AllowAny])  # Permitir acceso sin autenticación para pruebas
+@permission_classes(REPORT_PERMISSIONS)
+@renderer_classes(REPORT_RENDERERS)
+@conditional_on(Sale, SaleItem, Product, Customer)
 def generate_sales_report(request):
     """Generar reporte de ventas"""
     try:
@@ -71,112 +332,28 @@ def generate_sales_report(request):
         end_date = request.GET.get('end_date')
         format_type = request.GET.get('format', 'json')  # json, csv, excel
         
-        # Filtros de fecha
-        filter_kwargs = {}
-        if start_date:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            filter_kwargs['created_at__gte'] = timezone.make_aware(start_dt, timezone.get_current_timezone())
-        if end_date:
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-            filter_kwargs['created_at__lte'] = timezone.make_aware(end_dt, timezone.get_current_timezone())
+        # Exportación línea a línea (streaming, sin cargar todo en memoria)
+        if format_type == 'csv' and request.GET.get('detail') == 'lines':
+            return stream_sales_lines_csv(sales_date_filters(start_date, end_date))
+        if format_type in COLUMNAR_FORMATS and request.GET.get('detail') == 'lines':
+            return lines_columnar_response(
+                sales_lines_queryset(sales_date_filters(start_date, end_date)),
+                SALES_LINE_COLUMNS, 'sales_lines', format_type
+            )
         
-        # Obtener datos de ventas
-        sales = Sale.objects.filter(**filter_kwargs).select_related('customer').order_by('-created_at')
-        
-        # Estadísticas generales
-        total_sales = sales.aggregate(
-            total_amount=Sum('total_amount'),
-            total_count=Count('id')
+        report_data = get_or_build_report(
+            'sales', [start_date, end_date],
+            lambda: build_sales_report_data(start_date, end_date)
         )
         
-        # Datos por producto
-        products_data = SaleItem.objects.filter(
-            sale__in=sales
-        ).values(
-            'product__name', 'product__sku'
-        ).annotate(
-            total_quantity=Sum('quantity'),
-            total_revenue=Sum(F('quantity') * F('unit_price')),
-            sales_count=Count('sale', distinct=True)
-        ).order_by('-total_revenue')
-        
-        # Datos por cliente
-        customers_data = sales.values(
-            'customer__name', 'customer__email'
-        ).annotate(
-            total_spent=Sum('total_amount'),
-            purchase_count=Count('id')
-        ).order_by('-total_spent')
-        
-        # Datos por día
-        daily_sales = sales.extra(
-            select={'day': 'DATE(created_at)'}
-        ).values('day').annotate(
-            daily_total=Sum('total_amount'),
-            daily_count=Count('id')
-        ).order_by('day')
-        
-        # Serializar correctamente los valores numéricos
-        def safe_float(val):
-            try:
-                return float(val)
-            except Exception:
-                return 0.0
-
-        top_products = []
-        for prod in products_data[:10]:
-            prod = dict(prod)
-            prod['total_quantity'] = safe_float(prod.get('total_quantity', 0))
-            prod['total_revenue'] = safe_float(prod.get('total_revenue', 0))
-            prod['sales_count'] = safe_float(prod.get('sales_count', 0))
-            # Asegurar que no haya NaN
-            for k in ['total_quantity', 'total_revenue', 'sales_count']:
-                if prod[k] is None or prod[k] != prod[k]:
-                    prod[k] = 0.0
-            top_products.append(prod)
-
-        top_customers = []
-        for cust in customers_data[:10]:
-            cust = dict(cust)
-            cust['total_spent'] = safe_float(cust.get('total_spent', 0))
-            cust['purchase_count'] = safe_float(cust.get('purchase_count', 0))
-            for k in ['total_spent', 'purchase_count']:
-                if cust[k] is None or cust[k] != cust[k]:
-                    cust[k] = 0.0
-            top_customers.append(cust)
-
-        daily_sales_serialized = []
-        for day in daily_sales:
-            day = dict(day)
-            day['daily_total'] = safe_float(day.get('daily_total', 0))
-            day['daily_count'] = safe_float(day.get('daily_count', 0))
-            for k in ['daily_total', 'daily_count']:
-                if day[k] is None or day[k] != day[k]:
-                    day[k] = 0.0
-            daily_sales_serialized.append(day)
-
-        report_data = {
-            'period': {
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'summary': {
-                'total_amount': float(total_sales['total_amount'] or 0),
-                'total_sales': total_sales['total_count'],
-                'average_sale': float((total_sales['total_amount'] or 0) / max(total_sales['total_count'], 1))
-            },
-            'top_products': top_products,
-            'top_customers': top_customers,
-            'daily_sales': daily_sales_serialized,
-            'generated_at': timezone.now().isoformat()
-        }
-        
         if format_type == 'json':
-            return Response(report_data)
+            return Response(apply_layout(report_data, request.GET.get('layout')))
         elif format_type == 'csv':
             return generate_csv_response(report_data, 'sales_report')
         elif format_type == 'excel':
             return generate_excel_response(report_data, 'sales_report')
+        elif format_type in COLUMNAR_FORMATS:
+            return generate_columnar_response(report_data, request, 'sales_report', 'daily_sales')
             
     except Exception as e:
         return Response(
@@ -185,75 +362,69 @@ def generate_sales_report(request):
         )
 
 
+def build_inventory_report_data():
+    """Calcular los datos del reporte de inventario"""
+    # Obtener productos con stock bajo
+    low_stock_products = Product.objects.filter(
+        is_low_stock=True
+    ).values(
+        'name', 'sku', 'stock_quantity', 'min_stock_level', 'price', 'cost'
+    )
+    
+    # Estadísticas de inventario
+    inventory_stats = Product.objects.aggregate(
+        total_products=Count('id'),
+        active_products=Count('id', filter=Q(is_active=True)),
+        total_stock_value=Sum(F('stock_quantity') * F('cost')),
+        low_stock_count=Count('id', filter=Q(is_low_stock=True))
+    )
+    
+    # Productos por categoría
+    category_stats = Product.objects.values(
+        'category__name'
+    ).annotate(
+        product_count=Count('id'),
+        total_stock=Sum('stock_quantity'),
+        total_value=Sum(F('stock_quantity') * F('cost'))
+    ).order_by('-product_count')
+    
+    # Serializar los valores numéricos: una conversión vectorizada por columna
+    low_stock_serialized = numeric_rows(low_stock_products, ['stock_quantity', 'min_stock_level', 'price', 'cost'])
+    category_serialized = numeric_rows(category_stats, ['product_count', 'total_stock', 'total_value'])
+
+    report_data = {
+        'summary': {
+            'total_products': inventory_stats['total_products'],
+            'active_products': inventory_stats['active_products'],
+            'total_stock_value': float(inventory_stats['total_stock_value'] or 0),
+            'low_stock_count': inventory_stats['low_stock_count']
+        },
+        'low_stock_products': low_stock_serialized,
+        'category_breakdown': category_serialized,
+        'generated_at': timezone.now().isoformat()
+    }
+    return report_data
+
+
 @api_view(['GET'])
-@permission_classes([AllowAny])  # Permitir acceso sin autenticación para pruebas
+@permission_classes(REPORT_PERMISSIONS)
+@renderer_classes(REPORT_RENDERERS)
+@conditional_on(Product)
 def generate_inventory_report(request):
     """Generar reporte de inventario"""
     try:
         format_type = request.GET.get('format', 'json')
         
-        # Obtener productos con stock bajo
-        low_stock_products = Product.objects.filter(
-            stock_quantity__lte=F('min_stock_level')
-        ).values(
-            'name', 'sku', 'stock_quantity', 'min_stock_level', 'price', 'cost'
-        )
-        
-        # Estadísticas de inventario
-        inventory_stats = Product.objects.aggregate(
-            total_products=Count('id'),
-            active_products=Count('id', filter=Q(is_active=True)),
-            total_stock_value=Sum(F('stock_quantity') * F('cost')),
-            low_stock_count=Count('id', filter=Q(stock_quantity__lte=F('min_stock_level')))
-        )
-        
-        # Productos por categoría
-        category_stats = Product.objects.values(
-            'category__name'
-        ).annotate(
-            product_count=Count('id'),
-            total_stock=Sum('stock_quantity'),
-            total_value=Sum(F('stock_quantity') * F('cost'))
-        ).order_by('-product_count')
-        
-        # Serializar correctamente los valores numéricos en low_stock_products
-        low_stock_serialized = []
-        for prod in low_stock_products:
-            prod = dict(prod)
-            for k in ['stock_quantity', 'min_stock_level', 'price', 'cost']:
-                prod[k] = float(prod.get(k, 0) or 0)
-                if prod[k] is None or prod[k] != prod[k]:
-                    prod[k] = 0.0
-            low_stock_serialized.append(prod)
-
-        # Serializar correctamente los valores numéricos en category_breakdown
-        category_serialized = []
-        for cat in category_stats:
-            cat = dict(cat)
-            for k in ['product_count', 'total_stock', 'total_value']:
-                cat[k] = float(cat.get(k, 0) or 0)
-                if cat[k] is None or cat[k] != cat[k]:
-                    cat[k] = 0.0
-            category_serialized.append(cat)
-
-        report_data = {
-            'summary': {
-                'total_products': inventory_stats['total_products'],
-                'active_products': inventory_stats['active_products'],
-                'total_stock_value': float(inventory_stats['total_stock_value'] or 0),
-                'low_stock_count': inventory_stats['low_stock_count']
-            },
-            'low_stock_products': low_stock_serialized,
-            'category_breakdown': category_serialized,
-            'generated_at': timezone.now().isoformat()
-        }
+        report_data = get_or_build_report('inventory', [], build_inventory_report_data)
         
         if format_type == 'json':
-            return Response(report_data)
+            return Response(apply_layout(report_data, request.GET.get('layout')))
         elif format_type == 'csv':
             return generate_csv_response(report_data, 'inventory_report')
         elif format_type == 'excel':
             return generate_excel_response(report_data, 'inventory_report')
+        elif format_type in COLUMNAR_FORMATS:
+            return generate_columnar_response(report_data, request, 'inventory_report', 'category_breakdown')
             
     except Exception as e:
         return Response(
@@ -262,8 +433,75 @@ def generate_inventory_report(request):
         )
 
 
+def transaction_date_filters(start_date, end_date):
+    """Filtros de fecha sobre Transaction.transaction_date"""
+    filter_kwargs = {}
+    if start_date:
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        filter_kwargs['transaction_date__gte'] = start_dt.date()
+    if end_date:
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        filter_kwargs['transaction_date__lte'] = end_dt.date()
+    return filter_kwargs
+
+
+def build_financial_report_data(start_date, end_date):
+    """Calcular los datos del reporte financiero"""
+    filter_kwargs = transaction_date_filters(start_date, end_date)
+    
+    # Obtener transacciones
+    transactions = Transaction.objects.filter(**filter_kwargs)
+    
+    # Gastos por categoría
+    expense_categories = transactions.filter(
+        transaction_type='expense'
+    ).values(
+        'category__name'
+    ).annotate(
+        total_amount=Sum('amount'),
+        transaction_count=Count('id')
+    ).order_by('-total_amount')
+    
+    # Transacciones por mes
+    monthly_data = transactions.annotate(
+        month=TruncMonth('transaction_date')
+    ).values('month', 'transaction_type').annotate(
+        total_amount=Sum('amount')
+    ).order_by('month')
+    
+    # Ingresos y gastos: se suman desde la serie mensual, sin otra consulta
+    monthly_data = list(monthly_data)
+    income = sum(month['total_amount'] or 0 for month in monthly_data if month['transaction_type'] == 'income')
+    expenses = sum(month['total_amount'] or 0 for month in monthly_data if month['transaction_type'] == 'expense')
+    
+    # Serializar los valores numéricos: una conversión vectorizada por columna
+    expense_serialized = numeric_rows(expense_categories, ['total_amount', 'transaction_count'])
+    monthly_serialized = numeric_rows(monthly_data, ['total_amount'])
+    for month in monthly_serialized:
+        month['month'] = month['month'].strftime('%Y-%m')
+
+    report_data = {
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'summary': {
+            'total_income': float(income),
+            'total_expenses': float(expenses),
+            'net_profit': float(income - expenses),
+            'profit_margin': float((income - expenses) / max(income, 1) * 100)
+        },
+        'expense_categories': expense_serialized,
+        'monthly_data': monthly_serialized,
+        'generated_at': timezone.now().isoformat()
+    }
+    return report_data
+
+
 @api_view(['GET'])
-@permission_classes([AllowAny])  # Permitir acceso sin autenticación para pruebas
+@permission_classes(REPORT_PERMISSIONS)
+@renderer_classes(REPORT_RENDERERS)
+@conditional_on(Transaction)
 def generate_financial_report(request):
     """Generar reporte financiero"""
     try:
@@ -271,87 +509,28 @@ def generate_financial_report(request):
         end_date = request.GET.get('end_date')
         format_type = request.GET.get('format', 'json')
         
-        # Filtros de fecha
-        filter_kwargs = {}
-        if start_date:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            filter_kwargs['transaction_date__gte'] = start_dt.date()
-        if end_date:
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            filter_kwargs['transaction_date__lte'] = end_dt.date()
-        
-        # Obtener transacciones
-        transactions = Transaction.objects.filter(**filter_kwargs)
-        
-        # Ingresos y gastos
-        income = transactions.filter(transaction_type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        expenses = transactions.filter(transaction_type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # Gastos por categoría
-        expense_categories = transactions.filter(
-            transaction_type='expense'
-        ).values(
-            'category__name'
-        ).annotate(
-            total_amount=Sum('amount'),
-            transaction_count=Count('id')
-        ).order_by('-total_amount')
+        # Exportación línea a línea (streaming, sin cargar todo en memoria)
+        if format_type == 'csv' and request.GET.get('detail') == 'lines':
+            return stream_transaction_lines_csv(transaction_date_filters(start_date, end_date))
+        if format_type in COLUMNAR_FORMATS and request.GET.get('detail') == 'lines':
+            return lines_columnar_response(
+                transaction_lines_queryset(transaction_date_filters(start_date, end_date)),
+                TRANSACTION_LINE_COLUMNS, 'financial_lines', format_type
+            )
         
-        # Transacciones por mes (compatible con SQLite)
-        monthly_data = transactions.extra(
-            select={'month': 'strftime("%Y-%m", transaction_date)'}
-        ).values('month', 'transaction_type').annotate(
-            total_amount=Sum('amount')
-        ).order_by('month')
-        
-        # Serializar correctamente los valores numéricos en expense_categories
-        expense_serialized = []
-        for cat in expense_categories:
-            cat = dict(cat)
-            cat['total_amount'] = float(cat.get('total_amount', 0) or 0)
-            cat['transaction_count'] = float(cat.get('transaction_count', 0) or 0)
-            if cat['total_amount'] is None or cat['total_amount'] != cat['total_amount']:
-                cat['total_amount'] = 0.0
-            if cat['transaction_count'] is None or cat['transaction_count'] != cat['transaction_count']:
-                cat['transaction_count'] = 0.0
-            expense_serialized.append(cat)
-
-        # Serializar correctamente los valores numéricos en monthly_data
-        monthly_serialized = []
-        for month in monthly_data:
-            month = dict(month)
-            month['total_amount'] = float(month.get('total_amount', 0) or 0)
-            if month['total_amount'] is None or month['total_amount'] != month['total_amount']:
-                month['total_amount'] = 0.0
-            monthly_serialized.append(month)
-
-        report_data = {
-            'period': {
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'summary': {
-                'total_income': float(income),
-                'total_expenses': float(expenses),
-                'net_profit': float(income - expenses),
-                'profit_margin': float((income - expenses) / max(income, 1) * 100)
-            },
-            'expense_categories': expense_serialized,
-            'monthly_data': monthly_serialized,
-            'generated_at': timezone.now().isoformat()
-        }
+        report_data = get_or_build_report(
+            'financial', [start_date, end_date],
+            lambda: build_financial_report_data(start_date, end_date)
+        )
         
         if format_type == 'json':
-            return Response(report_data)
+            return Response(apply_layout(report_data, request.GET.get('layout')))
         elif format_type == 'csv':
             return generate_csv_response(report_data, 'financial_report')
         elif format_type == 'excel':
             return generate_excel_response(report_data, 'financial_report')
+        elif format_type in COLUMNAR_FORMATS:
+            return generate_columnar_response(report_data, request, 'financial_report', 'monthly_data')
             
     except Exception as e:
         return Response(
@@ -360,12 +539,308 @@ def generate_financial_report(request):
         )
 
 
+# Segmentos RFM: (nombre, condición sobre los puntajes R y F), evaluados en orden
+RFM_SEGMENTS = [
+    ('Campeones', lambda r, f: (r >= 4) & (f >= 4)),
+    ('Leales', lambda r, f: f >= 4),
+    ('Nuevos o prometedores', lambda r, f: r >= 4),
+    ('En riesgo', lambda r, f: (r <= 2) & (f >= 3)),
+    ('Hibernando', lambda r, f: r <= 2),
+]
+
+
+def quintile_scores(values):
+    """Puntaje 1-5 por quintil; los valores iguales reciben el mismo puntaje"""
+    if values.size == 0:
+        return values.astype(int)
+    ordered = np.sort(values)
+    percentile = np.searchsorted(ordered, values, side='right') / values.size
+    return np.clip(np.ceil(percentile * 5), 1, 5).astype(int)
+
+
+def build_customer_report_data(start_date, end_date, customer_totals=None):
+    """
+    Calcular recencia, frecuencia y valor monetario (RFM) de todos los clientes.
+    customer_totals: función que devuelve customer_sale_totals() (compartida en el bundle).
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError('numpy es necesario para el reporte de clientes')
+
+    # Compras (no canceladas) del período agrupadas por cliente, unidas en memoria
+    # a la lista de clientes. Los agregados llegan como float/texto para evitar
+    # convertir 100k Decimal y datetime en Python.
+    totals = customer_totals() if customer_totals is not None else customer_sale_totals(start_date, end_date)
+    no_purchases = (0.0, 0, 0, None, None, None)
+    rows = [
+        (customer_id, name, email, customer_type) + totals.get(customer_id, no_purchases)[2:]
+        for customer_id, name, email, customer_type in Customer.objects.values_list(
+            'id', 'name', 'email', 'customer_type'
+        ).order_by('id')
+    ]
+
+    ids, names, emails, types, frequency, monetary, first_purchase, last_purchase = (
+        list(column) for column in zip(*rows)
+    ) if rows else ([], [], [], [], [], [], [], [])
+
+    # Fechas (YYYY-MM-DD) de primera y última compra
+    first_purchase = [value[:10] if value else None for value in first_purchase]
+    last_purchase = [value[:10] if value else None for value in last_purchase]
+
+    # Puntajes vectorizados
+    reference = timezone.now()
+    if end_date:
+        reference = min(reference, sales_date_filters(None, end_date)['created_at__lte'])
+    frequency = np.array(frequency, dtype=int)
+    monetary = np.nan_to_num(np.array(monetary, dtype=float), nan=0.0)
+    last_days = np.array(last_purchase, dtype='datetime64[D]')
+    recency = (np.datetime64(reference.date(), 'D') - last_days).astype('timedelta64[D]')
+    recency = np.where(np.isnat(recency), np.nan, recency.astype(float))
+
+    buyers = frequency > 0
+    r_score = np.zeros(len(rows), dtype=int)
+    f_score = np.zeros(len(rows), dtype=int)
+    m_score = np.zeros(len(rows), dtype=int)
+    r_score[buyers] = quintile_scores(-recency[buyers])
+    f_score[buyers] = quintile_scores(frequency[buyers])
+    m_score[buyers] = quintile_scores(monetary[buyers])
+
+    segment = np.select(
+        [~buyers] + [condition(r_score, f_score) for _, condition in RFM_SEGMENTS],
+        ['Sin compras'] + [name for name, _ in RFM_SEGMENTS],
+        default='Regulares'
+    )
+
+    # tolist() convierte cada arreglo a tipos de Python en una sola pasada
+    recency_days = np.where(buyers, np.nan_to_num(recency), 0).astype(int).tolist()
+    columns = zip(
+        ids, names, emails, types, recency_days, buyers.tolist(), frequency.tolist(),
+        monetary.tolist(), first_purchase, last_purchase,
+        r_score.tolist(), f_score.tolist(), m_score.tolist(), segment.tolist()
+    )
+    customer_rfm = [
+        {
+            'customer_id': customer_id,
+            'name': name,
+            'email': email,
+            'customer_type': customer_type,
+            'recency_days': days if has_purchases else None,
+            'frequency': freq,
+            'monetary': value,
+            'first_purchase': first,
+            'last_purchase': last,
+            'r_score': r,
+            'f_score': f,
+            'm_score': m,
+            'segment': seg,
+        }
+        for customer_id, name, email, customer_type, days, has_purchases, freq, value,
+            first, last, r, f, m, seg in columns
+    ]
+
+    segment_names, segment_index = np.unique(segment, return_inverse=True)
+    segment_counts = np.bincount(segment_index, minlength=len(segment_names))
+    segment_totals = np.bincount(segment_index, weights=monetary, minlength=len(segment_names))
+    segments = sorted(
+        [
+            {'segment': str(name), 'customers': int(count), 'monetary': float(total)}
+            for name, count, total in zip(segment_names, segment_counts, segment_totals)
+        ],
+        key=lambda item: -item['monetary']
+    )
+
+    buyer_count = int(buyers.sum())
+    total_revenue = float(monetary.sum())
+    report_data = {
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'summary': {
+            'total_customers': len(rows),
+            'active_buyers': buyer_count,
+            'total_revenue': total_revenue,
+            'average_monetary': total_revenue / max(buyer_count, 1),
+            'average_frequency': float(frequency[buyers].mean()) if buyer_count else 0.0
+        },
+        'segments': segments,
+        'customer_rfm': customer_rfm,
+        'generated_at': timezone.now().isoformat()
+    }
+    return report_data
+
+
+@api_view(['GET'])
+@permission_classes(REPORT_PERMISSIONS)
+@renderer_classes(REPORT_RENDERERS)
+@conditional_on(Customer, Sale)
+def generate_customer_report(request):
+    """Generar reporte de clientes (RFM)"""
+    try:
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        format_type = request.GET.get('format', 'json')
+
+        report_data = get_or_build_report(
+            'customers', [start_date, end_date],
+            lambda: build_customer_report_data(start_date, end_date)
+        )
+
+        if format_type == 'json':
+            return Response(apply_layout(report_data, request.GET.get('layout')))
+        elif format_type == 'csv':
+            return generate_csv_response(report_data, 'customer_report')
+        elif format_type == 'excel':
+            return generate_excel_response(report_data, 'customer_report')
+        elif format_type in COLUMNAR_FORMATS:
+            return generate_columnar_response(report_data, request, 'customer_report', 'customer_rfm')
+
+    except Exception as e:
+        return Response(
+            {'error': f'Error generando reporte de clientes: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Secciones disponibles en /bundle/: tipo -> función (start_date, end_date, shared) -> datos.
+# shared.customer_totals() se calcula una sola vez para las secciones de ventas y clientes.
+BUNDLE_BUILDERS = {
+    'sales': lambda start_date, end_date, shared: get_or_build_report(
+        'sales', [start_date, end_date],
+        lambda: build_sales_report_data(start_date, end_date, shared.customer_totals_for_sales())
+    ),
+    'inventory': lambda start_date, end_date, shared: get_or_build_report(
+        'inventory', [], build_inventory_report_data
+    ),
+    'financial': lambda start_date, end_date, shared: get_or_build_report(
+        'financial', [start_date, end_date], lambda: build_financial_report_data(start_date, end_date)
+    ),
+    'customers': lambda start_date, end_date, shared: get_or_build_report(
+        'customers', [start_date, end_date],
+        lambda: build_customer_report_data(start_date, end_date, shared.customer_totals)
+    ),
+}
+
+
+class SharedAggregates:
+    """Agregados que varias secciones del bundle necesitan, calculados a lo sumo una vez"""
+
+    def __init__(self, start_date, end_date, types):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.types = types
+        self._customer_totals = None
+
+    def customer_totals(self):
+        if self._customer_totals is None:
+            self._customer_totals = customer_sale_totals(self.start_date, self.end_date)
+        return self._customer_totals
+
+    def customer_totals_for_sales(self):
+        # Solo vale la pena si la sección de clientes también la usa; si no, el
+        # reporte de ventas agrupa sobre SalesDailyRollup, más barato que Sale
+        return self.customer_totals if 'customers' in self.types else None
+
+
+@api_view(['GET'])
+@permission_classes(REPORT_PERMISSIONS)
+@conditional_on(Sale, SaleItem, Product, Customer, Transaction)
+def generate_report_bundle(request):
+    """Generar varios reportes en una sola respuesta, sobre una misma instantánea de los datos"""
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    types = [t.strip() for t in request.GET.get('types', 'sales,inventory,financial').split(',') if t.strip()]
+
+    invalid = [t for t in types if t not in BUNDLE_BUILDERS]
+    if invalid or not types:
+        return Response(
+            {'error': f'Tipos de reporte no válidos: {", ".join(invalid) or "ninguno"}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        sections = {}
+        timings = {}
+        shared = SharedAggregates(start_date, end_date, types)
+        outermost = not connection.in_atomic_block
+        with transaction.atomic():
+            if outermost and connection.vendor == 'postgresql':
+                # Con READ COMMITTED cada consulta vería su propia instantánea;
+                # REPEATABLE READ da a todas las secciones la misma
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            for report_type in dict.fromkeys(types):
+                started = time.perf_counter()
+                sections[report_type] = apply_layout(
+                    BUNDLE_BUILDERS[report_type](start_date, end_date, shared),
+                    request.GET.get('layout')
+                )
+                timings[report_type] = round((time.perf_counter() - started) * 1000, 2)
+
+        return Response({
+            'period': {
+                'start_date': start_date,
+                'end_date': end_date
+            },
+            'sections': sections,
+            'timings_ms': timings,
+            'generated_at': timezone.now().isoformat()
+        })
+    except Exception as e:
+        return Response(
+            {'error': f'Error generando reportes: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def numeric_column(values):
+    """Convertir una columna a float en una sola pasada (None/NaN -> 0.0)"""
+    if NUMPY_AVAILABLE:
+        column = np.array(values, dtype=float)
+        return np.nan_to_num(column, nan=0.0, posinf=0.0, neginf=0.0).tolist()
+    column = [float(v) if v is not None else 0.0 for v in values]
+    return [v if v == v else 0.0 for v in column]
+
+
+def numeric_rows(rows, numeric_fields):
+    """Copiar las filas convirtiendo cada campo numérico con una sola pasada por columna"""
+    rows = [dict(row) for row in rows]
+    for key in numeric_fields:
+        for row, value in zip(rows, numeric_column([row.get(key) for row in rows])):
+            row[key] = value
+    return rows
+
+
+def to_columnar(rows):
+    """Transponer una lista de dicts (ya serializados por los builders) a {"campo": [valores...]}"""
+    if not rows:
+        return {}
+    return {key: [row.get(key) for row in rows] for key in rows[0].keys()}
+
+
+def apply_layout(report_data, layout):
+    """Con layout=columnar las series temporales se devuelven como arreglos por columna"""
+    if layout != 'columnar':
+        return report_data
+    data = dict(report_data)
+    for key in COLUMNAR_SERIES:
+        if key in data:
+            data[key] = to_columnar(data[key])
+    data['layout'] = 'columnar'
+    return data
+
+
 def generate_csv_response(data, filename):
     """Generar respuesta CSV"""
     response = HttpResponse(content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.now().strftime("%Y%m%d")}.csv"'
-    response.write('\ufeff')
-    writer = csv.writer(response)
+    write_csv_report(data, response)
+    return response
+
+
+def write_csv_report(data, output):
+    """Escribir el reporte en formato CSV sobre cualquier objeto con write()"""
+    output.write('\ufeff')
+    writer = csv.writer(output)
 
     # Escribir encabezados y datos según el tipo de reporte
     if 'summary' in data:
@@ -437,11 +912,201 @@ def generate_csv_response(data, filename):
             writer.writerow([month.get(h, '') for h in headers])
         writer.writerow([])
 
+    # Exportar segments si existe
+    if 'segments' in data and data['segments']:
+        writer.writerow(['Segmentos de Clientes'])
+        headers = list(data['segments'][0].keys())
+        writer.writerow(headers)
+        for segment in data['segments']:
+            writer.writerow([segment.get(h, '') for h in headers])
+        writer.writerow([])
+
+    # Exportar customer_rfm si existe
+    if 'customer_rfm' in data and data['customer_rfm']:
+        writer.writerow(['Análisis RFM de Clientes'])
+        headers = list(data['customer_rfm'][0].keys())
+        writer.writerow(headers)
+        for cust in data['customer_rfm']:
+            writer.writerow([cust.get(h, '') for h in headers])
+        writer.writerow([])
+
+
+# Filas leídas por viaje al cursor del servidor en las exportaciones línea a línea
+LINE_EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer: csv.writer devuelve la línea en vez de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+def generate_streaming_csv_response(headers, rows, filename):
+    """Generar respuesta CSV en streaming a partir de un iterador de filas"""
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield '\ufeff'
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.now().strftime("%Y%m%d")}.csv"'
     return response
 
 
+# Columnas de las exportaciones línea a línea: (encabezado, lookup)
+SALES_LINE_COLUMNS = [
+    ('sale_number', 'sale__sale_number'),
+    ('created_at', 'sale__created_at'),
+    ('status', 'sale__status'),
+    ('payment_method', 'sale__payment_method'),
+    ('customer', 'sale__customer__name'),
+    ('product_sku', 'product__sku'),
+    ('product_name', 'product__name'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'unit_price'),
+    ('total_price', 'total_price'),
+]
+
+TRANSACTION_LINE_COLUMNS = [
+    ('transaction_date', 'transaction_date'),
+    ('transaction_type', 'transaction_type'),
+    ('description', 'description'),
+    ('category', 'category__name'),
+    ('payment_method', 'payment_method'),
+    ('receipt_number', 'receipt_number'),
+    ('amount', 'amount'),
+]
+
+
+def sales_lines_queryset(filter_kwargs):
+    """SaleItem del período en orden cronológico"""
+    item_filters = {f'sale__{key}': value for key, value in filter_kwargs.items()}
+    return SaleItem.objects.filter(**item_filters).order_by('sale__created_at', 'id')
+
+
+def transaction_lines_queryset(filter_kwargs):
+    """Transaction del período en orden cronológico"""
+    return Transaction.objects.filter(**filter_kwargs).order_by('transaction_date', 'id')
+
+
+def stream_lines_csv(queryset, line_columns, filename):
+    headers = [header for header, _ in line_columns]
+    rows = queryset.values_list(
+        *[lookup for _, lookup in line_columns]
+    ).iterator(chunk_size=LINE_EXPORT_CHUNK_SIZE)
+    return generate_streaming_csv_response(headers, rows, filename)
+
+
+def stream_sales_lines_csv(filter_kwargs):
+    """Exportar cada SaleItem del período como una línea CSV"""
+    return stream_lines_csv(sales_lines_queryset(filter_kwargs), SALES_LINE_COLUMNS, 'sales_lines')
+
+
+def stream_transaction_lines_csv(filter_kwargs):
+    """Exportar cada Transaction del período como una línea CSV"""
+    return stream_lines_csv(transaction_lines_queryset(filter_kwargs), TRANSACTION_LINE_COLUMNS, 'financial_lines')
+
+
+def generate_columnar_response(report_data, request, filename, default_section):
+    """Exportar una sección del reporte (por defecto su serie principal) a Parquet/Arrow"""
+    if not PYARROW_AVAILABLE:
+        return columnar_unavailable_response()
+    section = request.GET.get('section', default_section)
+    records = report_data.get(section)
+    if not isinstance(records, list):
+        return Response(
+            {'error': f'Sección no exportable: {section}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return records_columnar_response(records, f'{filename}_{section}', request.GET.get('format'))
+
+
+def columnar_unavailable_response():
+    return Response(
+        {'error': 'Exportación Parquet/Arrow no disponible: instale pyarrow'},
+        status=status.HTTP_501_NOT_IMPLEMENTED
+    )
+
+
+def lines_columnar_response(queryset, line_columns, filename, format_type):
+    if not PYARROW_AVAILABLE:
+        return columnar_unavailable_response()
+    return queryset_columnar_response(
+        queryset, [lookup for _, lookup in line_columns], filename, format_type,
+        names=[header for header, _ in line_columns]
+    )
+
+
+@api_view(['GET'])
+@permission_classes(REPORT_PERMISSIONS)
+@renderer_classes(REPORT_RENDERERS)
+def export_table(request, table):
+    """Exportar una tabla completa (sales, sale_items, transactions) a Parquet o Arrow IPC"""
+    format_type = request.GET.get('format', 'parquet')
+    if table not in EXPORT_TABLES:
+        return Response(
+            {'error': f'Tabla no exportable: {table}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if format_type not in COLUMNAR_FORMATS:
+        return Response(
+            {'error': 'Formato debe ser "parquet" o "arrow"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not PYARROW_AVAILABLE:
+        return columnar_unavailable_response()
+
+    config = EXPORT_TABLES[table]
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    try:
+        if config['date_field'] == 'transaction_date':
+            filter_kwargs = transaction_date_filters(start_date, end_date)
+        else:
+            filter_kwargs = {
+                key.replace('created_at', config['date_field'], 1): value
+                for key, value in sales_date_filters(start_date, end_date).items()
+            }
+    except ValueError:
+        return Response(
+            {'error': 'Formato de fecha inválido, use YYYY-MM-DD'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = config['model'].objects.filter(**filter_kwargs).order_by('id')
+    return queryset_columnar_response(queryset, config['columns'], table, format_type)
+
+
+# Bloques de datos exportados a Excel, en orden
+EXCEL_SECTIONS = [
+    ('top_products', 'Top Productos'),
+    ('top_customers', 'Top Clientes'),
+    ('daily_sales', 'Ventas Diarias'),
+    ('low_stock_products', 'Productos con Stock Bajo'),
+    ('category_breakdown', 'Resumen por Categoría'),
+    ('expense_categories', 'Gastos por Categoría'),
+    ('monthly_data', 'Transacciones Mensuales'),
+    ('segments', 'Segmentos de Clientes'),
+    ('customer_rfm', 'Análisis RFM de Clientes'),
+]
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def excel_column_width(max_length):
+    """Ancho de columna a partir del texto más largo"""
+    return (max_length + 2) * 1.2
+
+
 def generate_excel_response(data, filename):
     """Generar respuesta Excel"""
+    if XLSXWRITER_AVAILABLE:
+        return generate_xlsxwriter_response(data, filename)
+
     if not OPENPYXL_AVAILABLE:
         # Si openpyxl no está disponible, generar CSV en su lugar
         response = HttpResponse(content_type='text/csv; charset=utf-8')
@@ -458,6 +1123,7 @@ def generate_excel_response(data, filename):
     
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
     import io
 
     wb = Workbook()
@@ -472,15 +1138,24 @@ def generate_excel_response(data, filename):
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
 
     row = 1
+    # Ancho máximo por columna, calculado mientras se escribe
+    widths = {}
+
+    def write_cell(row_idx, col_idx, value):
+        cell = ws.cell(row=row_idx, column=col_idx, value=value)
+        if value:
+            widths[col_idx] = max(widths.get(col_idx, 0), len(str(value)))
+        return cell
+
     # Resumen
     if 'summary' in data:
-        cell = ws.cell(row=row, column=1, value="Resumen del Reporte")
+        cell = write_cell(row, 1, "Resumen del Reporte")
         cell.font = header_font
         cell.fill = header_fill
         row += 1
         for key, value in data['summary'].items():
-            ws.cell(row=row, column=1, value=key.replace('_', ' ').title())
-            ws.cell(row=row, column=2, value=value)
+            write_cell(row, 1, key.replace('_', ' ').title())
+            write_cell(row, 2, value)
             row += 1
         row += 1
 
@@ -488,52 +1163,90 @@ def generate_excel_response(data, filename):
     def write_block(title, items):
         nonlocal row
         if items:
-            cell = ws.cell(row=row, column=1, value=title)
+            cell = write_cell(row, 1, title)
             cell.font = header_font
             cell.fill = header_fill
             row += 1
             headers = list(items[0].keys())
             for col_num, h in enumerate(headers, 1):
-                ws.cell(row=row, column=col_num, value=h)
+                write_cell(row, col_num, h)
             row += 1
             for item in items:
                 for col_num, h in enumerate(headers, 1):
-                    ws.cell(row=row, column=col_num, value=item.get(h, ''))
+                    write_cell(row, col_num, item.get(h, ''))
                 row += 1
             row += 1
 
-    write_block("Top Productos", data.get('top_products', []))
-    write_block("Top Clientes", data.get('top_customers', []))
-    write_block("Ventas Diarias", data.get('daily_sales', []))
-    write_block("Productos con Stock Bajo", data.get('low_stock_products', []))
-    write_block("Resumen por Categoría", data.get('category_breakdown', []))
-    write_block("Gastos por Categoría", data.get('expense_categories', []))
-    write_block("Transacciones Mensuales", data.get('monthly_data', []))
+    for key, title in EXCEL_SECTIONS:
+        write_block(title, data.get(key, []))
 
     # Ajustar ancho de columnas
-    from openpyxl.utils import get_column_letter
-    for col_idx in range(1, ws.max_column + 1):
-        max_length = 0
-        column_letter = get_column_letter(col_idx)
-        for row_idx in range(1, ws.max_row + 1):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            try:
-                if cell.value and len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except Exception:
-                pass
-        adjusted_width = (max_length + 2) * 1.2
-        ws.column_dimensions[column_letter].width = adjusted_width
+    for col_idx, max_length in widths.items():
+        ws.column_dimensions[get_column_letter(col_idx)].width = excel_column_width(max_length)
 
     # Guardar en memoria
     output = io.BytesIO()
     wb.save(output)
     output.seek(0)
 
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    response = HttpResponse(output.getvalue(), content_type=EXCEL_CONTENT_TYPE)
     response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.now().strftime("%Y%m%d")}.xlsx"'
 
     return response
+
+
+def write_xlsxwriter_report(data, output):
+    """
+    Escribir el reporte con xlsxwriter en modo constant_memory.
+    Las filas se vuelcan a disco a medida que se escriben, por lo que la memoria
+    no crece con el número de filas; los anchos de columna se calculan al vuelo.
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    ws = workbook.add_worksheet('Reporte')
+    header_format = workbook.add_format({'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#366092'})
+
+    row = 0
+    widths = {}
+
+    def write_row(values, cell_format=None):
+        nonlocal row
+        for col_idx, value in enumerate(values):
+            if value is None:
+                value = ''
+            ws.write(row, col_idx, value, cell_format)
+            if value != '':
+                widths[col_idx] = max(widths.get(col_idx, 0), len(str(value)))
+        row += 1
+
+    if 'summary' in data:
+        write_row(["Resumen del Reporte"], header_format)
+        for key, value in data['summary'].items():
+            write_row([key.replace('_', ' ').title(), value])
+        row += 1
+
+    for key, title in EXCEL_SECTIONS:
+        items = data.get(key, [])
+        if items:
+            write_row([title], header_format)
+            headers = list(items[0].keys())
+            write_row(headers)
+            for item in items:
+                write_row([item.get(h, '') for h in headers])
+            row += 1
+
+    # En constant_memory set_column sigue permitido después de escribir filas
+    for col_idx, max_length in widths.items():
+        ws.set_column(col_idx, col_idx, excel_column_width(max_length))
+
+    workbook.close()
+
+
+def generate_xlsxwriter_response(data, filename):
+    """Generar respuesta Excel con xlsxwriter, servida desde un archivo temporal"""
+    output = tempfile.TemporaryFile()
+    write_xlsxwriter_report(data, output)
+    output.seek(0)
+
+    response = FileResponse(output, content_type=EXCEL_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.now().strftime("%Y%m%d")}.xlsx"'
+    return response
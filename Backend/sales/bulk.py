@@ -0,0 +1,167 @@
+"""
+Bulk ingestion of offline POS sales (POST /api/sales/bulk/).
+
+The whole batch is handled set-based: products and customers are loaded once,
+stock is checked in memory against one locked read of the products, and sales
+and items are written with bulk_create. Every entry gets its own result, so
+one bad sale does not block the rest of the batch.
+"""
+from collections import defaultdict
+from django.db import transaction, IntegrityError
+from reports.cache import bump_data_version
+from products.models import Product
+from products.stock import lock_products, apply_stock_deltas
+from customers.models import Customer
+from customers.purchases import add_purchases
+from changes.outbox import record_changes
+from .models import Sale, SaleItem
+from .numbering import allocate_sale_numbers
+from .rollup import add_sales_to_rollup
+from .serializers import SaleBulkEntrySerializer, referenced_ids
+
+MAX_BULK_SALES = 1000
+IDEMPOTENCY_ATTEMPTS = 3
+
+
+def validate_entries(entries, context):
+    """Validate every entry, returning ({index: validated_data}, {index: errors})"""
+    items = []
+    for entry in entries:
+        if isinstance(entry, dict) and isinstance(entry.get('items'), list):
+            items.extend(entry['items'])
+    context = dict(context)
+    context['preloaded_products'] = Product.objects.in_bulk(referenced_ids(items, 'product'))
+    context['preloaded_customers'] = Customer.objects.in_bulk(referenced_ids(entries, 'customer'))
+
+    valid = {}
+    errors = {}
+    for index, entry in enumerate(entries):
+        serializer = SaleBulkEntrySerializer(data=entry, context=context)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+    return valid, errors
+
+
+def stock_needed(sale_data):
+    """Quantity needed per product (stock-tracked products only)"""
+    quantities = defaultdict(int)
+    for item_data in sale_data['items']:
+        if item_data['product'].type == 'product':
+            quantities[item_data['product'].pk] += item_data['quantity']
+    return quantities
+
+
+def write_batch(valid, user):
+    """
+    Create the sales of the validated entries ({index: data}) in the current
+    transaction; returns {index: result} for every entry.
+    """
+    results = {}
+    # Keys synced before (or repeated within the batch) are reported, not re-created
+    keys = [data['idempotency_key'] for data in valid.values()]
+    synced = {
+        key: (sale_id, sale_number)
+        for key, sale_id, sale_number in Sale.objects.filter(idempotency_key__in=keys).values_list(
+            'idempotency_key', 'id', 'sale_number'
+        )
+    }
+    pending = []
+    seen = set()
+    for index, data in valid.items():
+        key = data['idempotency_key']
+        if key in synced:
+            sale_id, sale_number = synced[key]
+            results[index] = {'status': 'duplicate', 'id': sale_id, 'sale_number': sale_number}
+        elif key in seen:
+            results[index] = {'status': 'duplicate', 'errors': {'idempotency_key': ['Repetida en el lote']}}
+        else:
+            seen.add(key)
+            pending.append(index)
+
+    # Stock check for the whole batch against one locked read, in arrival order
+    needed = {index: stock_needed(valid[index]) for index in pending}
+    products = lock_products({product_id for quantities in needed.values() for product_id in quantities})
+    available = {product_id: product.stock_quantity for product_id, product in products.items()}
+    accepted = []
+    deltas = defaultdict(int)
+    for index in pending:
+        short = [
+            product_id for product_id, quantity in needed[index].items()
+            if available.get(product_id, 0) < quantity
+        ]
+        if short:
+            results[index] = {'status': 'error', 'errors': {'items': [
+                f"Stock insuficiente para el producto {product_id}. Disponible: {available.get(product_id, 0)}"
+                for product_id in short
+            ]}}
+            continue
+        for product_id, quantity in needed[index].items():
+            available[product_id] -= quantity
+            deltas[product_id] -= quantity
+        accepted.append(index)
+
+    sales = []
+    for index, sale_number in zip(accepted, allocate_sale_numbers(len(accepted))):
+        data = {field: value for field, value in valid[index].items() if field != 'items'}
+        sales.append(Sale(sale_number=sale_number, created_by=user, **data))
+    sales = Sale.objects.bulk_create(sales)
+
+    # bulk_create skips SaleItem.save(), so total_price is set here
+    items_by_sale = {}
+    all_items = []
+    for index, sale in zip(accepted, sales):
+        items = [
+            SaleItem(sale=sale, total_price=item_data['quantity'] * item_data['unit_price'], **item_data)
+            for item_data in valid[index]['items']
+        ]
+        items_by_sale[sale.pk] = items
+        all_items.extend(items)
+    SaleItem.objects.bulk_create(all_items)
+    # bulk_create sends no signals, so the outbox records are written here
+    record_changes(Sale, [sale.pk for sale in sales], 'create')
+    record_changes(SaleItem, [item.pk for item in all_items], 'create')
+    apply_stock_deltas(deltas)
+
+    add_sales_to_rollup((sale, items_by_sale[sale.pk]) for sale in sales)
+    purchases = {}
+    for sale in sales:
+        if sale.customer_id:
+            amount, count, latest = purchases.get(sale.customer_id, (0, 0, sale.created_at))
+            purchases[sale.customer_id] = (amount + sale.total_amount, count + 1, max(latest, sale.created_at))
+    add_purchases(purchases)
+    for index, sale in zip(accepted, sales):
+        results[index] = {'status': 'created', 'id': sale.pk, 'sale_number': sale.sale_number}
+
+    if sales:
+        # bulk_create sends no post_save signals
+        transaction.on_commit(bump_data_version)
+    return results
+
+
+def ingest_sales(entries, user, context):
+    """Create the sales of a batch; returns one result dict per entry, in order"""
+    valid, errors = validate_entries(entries, context)
+    results = [None] * len(entries)
+    for index, entry_errors in errors.items():
+        results[index] = {'status': 'error', 'errors': entry_errors}
+
+    for attempt in range(IDEMPOTENCY_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                written = write_batch(valid, user)
+            break
+        except IntegrityError:
+            # A concurrent sync (typically a retry after a timeout) committed some of
+            # the same idempotency keys after we resolved them: the next attempt
+            # sees them and reports those entries as duplicates
+            if attempt == IDEMPOTENCY_ATTEMPTS - 1:
+                raise
+    for index, result in written.items():
+        results[index] = result
+
+    for index, entry in enumerate(entries):
+        key = entry.get('idempotency_key') if isinstance(entry, dict) else None
+        results[index] = {'index': index, 'idempotency_key': key, **results[index]}
+    return results
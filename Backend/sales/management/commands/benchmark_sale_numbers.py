@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test.utils import override_settings
+from sales.models import Sale
+from sales.numbering import release_blocks
+
+BENCHMARK_NOTE = 'benchmark_sale_numbers'
+# Las ventas del benchmark no deben invalidar el caché compartido de reportes
+SCRATCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea ventas concurrentes para medir la asignación de números de venta y verificar que no se repiten. '
+        'Se ejecuta en una base de datos de prueba desechable: la numeración, el outbox y el caché reales no se tocan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sales', type=int, default=500, help='Ventas a crear')
+        parser.add_argument('--workers', type=int, default=50, help='Hilos concurrentes')
+        parser.add_argument('--block-size', type=int, help='Sobrescribe SALE_NUMBER_BLOCK_SIZE')
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help='Borrar sin preguntar una base de datos de prueba anterior'
+        )
+
+    def create_sale(self, _):
+        try:
+            return Sale.objects.create(total_amount=0, notes=BENCHMARK_NOTE)
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        overrides = {'CACHES': SCRATCH_CACHES}
+        if options['block_size']:
+            overrides['SALE_NUMBER_BLOCK_SIZE'] = options['block_size']
+
+        # Los hilos confirman sus propias transacciones, así que no basta con revertir
+        # una: todo el benchmark corre en una copia vacía que se destruye al final
+        connection = connections[DEFAULT_DB_ALIAS]
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST']['NAME']:
+            # La base de prueba en memoria de SQLite no admite escrituras desde varios hilos
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'geb_benchmark_sale_numbers.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=not options['interactive'])
+        try:
+            with override_settings(**overrides):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                    sales = list(pool.map(self.create_sale, range(options['sales'])))
+                elapsed = time.perf_counter() - started
+            close_old_connections()
+        finally:
+            release_blocks()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        numbers = [sale.sale_number for sale in sales]
+        duplicates = len(numbers) - len(set(numbers))
+
+        self.stdout.write(
+            f'{len(sales)} ventas con {options["workers"]} hilos en {elapsed:.2f}s '
+            f'({len(sales) / elapsed:.0f} ventas/s), primer número {min(numbers)}, último {max(numbers)}'
+        )
+        if duplicates:
+            raise CommandError(f'{duplicates} números de venta repetidos')
+        self.stdout.write(self.style.SUCCESS('Sin números de venta repetidos'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from sales.rollup import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla de totales diarios de ventas (SalesDailyRollup)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_sales_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Rollup de ventas reconstruido: {rows} filas'))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_initial'),
+        ('products', '0005_auto_20250723_1308'),
+        ('sales', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rebuilt_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'sales_rollup_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('completed', 'Completada'), ('cancelled', 'Cancelada')], default='pending', max_length=20)),
+                ('sale_count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='customers.customer')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='products.product')),
+            ],
+            options={
+                'db_table': 'sales_daily_rollup',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_initial'),
+        ('products', '0005_auto_20250723_1308'),
+        ('sales', '0003_sales_daily_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at', 'status'], name='sales_created_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saleitem',
+            index=models.Index(fields=['sale', 'product'], name='sale_items_sale_product_idx'),
+        ),
+        migrations.AlterField(
+            model_name='saleitem',
+            name='sale',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='sales.sale'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def seed_sale_number_sequence(apps, schema_editor):
+    Sale = apps.get_model('sales', 'Sale')
+    SaleNumberSequence = apps.get_model('sales', 'SaleNumberSequence')
+    last_number = 0
+    for sale_number in Sale.objects.values_list('sale_number', flat=True).iterator():
+        suffix = sale_number.rsplit('-', 1)[-1]
+        if suffix.isdigit():
+            last_number = max(last_number, int(suffix))
+    SaleNumberSequence.objects.create(name='sale', next_value=last_number + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleNumberSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'sales_number_sequence',
+            },
+        ),
+        migrations.RunPython(seed_sale_number_sequence, migrations.RunPython.noop),
+    ]
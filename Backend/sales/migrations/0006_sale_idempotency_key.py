@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sale_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_purchase_totals'),
+        ('sales', '0007_saleitem_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at', 'id'], name='sales_created_id_idx'),
+        ),
+    ]
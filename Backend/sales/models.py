@@ -33,6 +33,8 @@ class Sale(models.Model):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     notes = models.TextField(blank=True)
+    # Client-generated key of sales synced through /api/sales/bulk/ (offline POS)
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -43,27 +45,31 @@ class Sale(models.Model):
     def save(self, *args, **kwargs):
         if not self.sale_number:
             # Generate sale number
-            last_sale = Sale.objects.order_by('-id').first()
-            if last_sale:
-                last_number = int(last_sale.sale_number.split('-')[-1])
-                self.sale_number = f"SALE-{last_number + 1:06d}"
-            else:
-                self.sale_number = "SALE-000001"
+            from .numbering import next_sale_number
+            self.sale_number = next_sale_number()
         super().save(*args, **kwargs)
     
     class Meta:
         db_table = 'sales'
+        indexes = [
+            models.Index(fields=['created_at', 'status'], name='sales_created_status_idx'),
+            # Keyset pagination of the sales list (sales.pagination)
+            models.Index(fields=['created_at', 'id'], name='sales_created_id_idx'),
+        ]
 
 
 class SaleItem(models.Model):
     """
     Individual items in a sale
     """
-    sale = models.ForeignKey(Sale, related_name='items', on_delete=models.CASCADE)
+    # Indexed through sale_items_sale_product_idx, whose leading column is sale
+    sale = models.ForeignKey(Sale, related_name='items', on_delete=models.CASCADE, db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Part of the report fingerprint (reports.conditional): line edits must change the ETag
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
@@ -74,3 +80,54 @@ class SaleItem(models.Model):
     
     class Meta:
         db_table = 'sale_items'
+        indexes = [
+            models.Index(fields=['sale', 'product'], name='sale_items_sale_product_idx'),
+        ]
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Daily sales totals per product and customer, maintained incrementally.
+    Rows with product=NULL hold sale-level totals (count and total_amount);
+    rows with a product hold line totals for that product.
+    """
+    day = models.DateField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Sale.STATUS_CHOICES, default='pending')
+    sale_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"{self.day} - {self.product_id or 'total'} - {self.customer_id}"
+    
+    class Meta:
+        db_table = 'sales_daily_rollup'
+
+
+class SalesRollupState(models.Model):
+    """
+    Marks the rollup as complete. Written by the rebuild_sales_rollup command;
+    until it exists reports fall back to scanning the sales tables.
+    """
+    rebuilt_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'sales_rollup_state'
+
+
+class SaleNumberSequence(models.Model):
+    """
+    Counter behind sale numbers. next_value is the first number not yet handed
+    out to any process; see sales.numbering for the allocation protocol.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+    
+    class Meta:
+        db_table = 'sales_number_sequence'
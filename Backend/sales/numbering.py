@@ -0,0 +1,101 @@
+"""
+Allocation of sale numbers (SALE-000123).
+
+Numbers come from the SaleNumberSequence row. A process reserves a block of
+SALE_NUMBER_BLOCK_SIZE numbers with one UPDATE next_value = next_value + size,
+which locks the row, so two processes never receive the same block; the rest of
+the block is then handed out from memory without touching the database.
+
+A block reserved inside a transaction only becomes usable once that transaction
+commits. If it rolls back, the counter goes back as well and the block is
+dropped, so numbers are never handed out twice.
+"""
+import os
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from .models import Sale, SaleNumberSequence
+
+SALE_SEQUENCE = 'sale'
+SALE_NUMBER_FORMAT = 'SALE-%06d'
+
+_lock = threading.Lock()
+# Reserved, unused ranges [start, end) owned by this process
+_blocks = {'pid': None, 'ranges': []}
+
+
+def initial_sale_number():
+    """First free number after the existing sales, used to seed the counter"""
+    last_number = 0
+    for sale_number in Sale.objects.values_list('sale_number', flat=True).iterator():
+        suffix = sale_number.rsplit('-', 1)[-1]
+        if suffix.isdigit():
+            last_number = max(last_number, int(suffix))
+    return last_number + 1
+
+
+def reserve_block(size):
+    """Reserve size consecutive numbers in the counter and return the first one"""
+    sequence = SaleNumberSequence.objects.filter(name=SALE_SEQUENCE)
+    with transaction.atomic():
+        if not sequence.update(next_value=F('next_value') + size):
+            SaleNumberSequence.objects.get_or_create(
+                name=SALE_SEQUENCE, defaults={'next_value': initial_sale_number()}
+            )
+            sequence.update(next_value=F('next_value') + size)
+        end = sequence.values_list('next_value', flat=True).get()
+    return end - size
+
+
+def own_blocks():
+    """Reserved ranges of this process (a forked worker does not inherit its parent's)"""
+    if _blocks['pid'] != os.getpid():
+        _blocks.update(pid=os.getpid(), ranges=[])
+    return _blocks['ranges']
+
+
+def take_from_block():
+    with _lock:
+        ranges = own_blocks()
+        while ranges:
+            start, end = ranges[0]
+            if start < end:
+                ranges[0] = (start + 1, end)
+                return start
+            ranges.pop(0)
+    return None
+
+
+def keep_block(start, end):
+    """Make [start, end) available to later allocations in this process"""
+    with _lock:
+        own_blocks().append((start, end))
+
+
+def release_blocks():
+    """Forget the reserved ranges of this process (e.g. once their database is gone)"""
+    with _lock:
+        own_blocks().clear()
+
+
+def next_sale_number():
+    number = take_from_block()
+    if number is None:
+        size = max(settings.SALE_NUMBER_BLOCK_SIZE, 1)
+        number = reserve_block(size)
+        if size > 1:
+            rest = (number + 1, number + size)
+            if connection.in_atomic_block:
+                transaction.on_commit(lambda: keep_block(*rest))
+            else:
+                keep_block(*rest)
+    return SALE_NUMBER_FORMAT % number
+
+
+def allocate_sale_numbers(count):
+    """count consecutive sale numbers for bulk inserts, reserved with one UPDATE"""
+    if count <= 0:
+        return []
+    start = reserve_block(count)
+    return [SALE_NUMBER_FORMAT % number for number in range(start, start + count)]
@@ -0,0 +1,118 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class SaleCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first. The cursor holds the
+    (created_at, id) of the last row served and the next page is
+    created_at < x OR (created_at = x AND id < y): a range seek on
+    sales_created_id_idx, with no COUNT(*) and no OFFSET, so deep pages and
+    runs of sales sharing one created_at (bulk offline sync) cost the same as
+    the first page.
+
+    Responses have the same shape as DRF's CursorPagination (next, previous,
+    results); previous links page back towards the newest sales.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        reverse = False
+        if cursor is not None:
+            reverse, created_at, pk = cursor
+            # created_at <= / >= bounds the index range; the OR only resolves ties
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+                ).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+                )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            # Fetched oldest first; the row the cursor came from follows this page
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_position = (False, rows[-1]) if rows and has_next else None
+        self.previous_position = (True, rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        """(reverse, created_at, id) of the ?cursor= parameter, or None for the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            created_at = parse_datetime(tokens['p'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, created_at, pk
+
+    def encode_cursor(self, position):
+        reverse, row = position
+        tokens = {'p': row.created_at.isoformat(), 'i': row.pk}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens, doseq=True).encode('ascii')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position) if self.next_position else None
+
+    def get_previous_link(self):
+        if self.previous_position:
+            return self.encode_cursor(self.previous_position)
+        return None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
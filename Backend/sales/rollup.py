@@ -0,0 +1,187 @@
+"""
+Incremental maintenance of SalesDailyRollup.
+
+Each sale contributes one sale-level row (product=NULL) and one row per product
+to the (day, product, customer, status) bucket it belongs to. Creating a sale adds
+its contribution; changing its status moves it to the new bucket.
+"""
+from itertools import islice
+from django.db import transaction
+from django.db.models import Sum, Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Sale, SaleItem, SalesDailyRollup, SalesRollupState
+
+REBUILD_BATCH_SIZE = 1000
+ROLLUP_MEASURES = ['sale_count', 'quantity', 'revenue', 'total_amount']
+
+
+def sales_rollup_ready():
+    return SalesRollupState.objects.exists()
+
+
+def sale_rollup_rows(sale, items=None):
+    """
+    Measures the sale contributes to the rollup, keyed by product_id.
+    items (SaleItem instances already in memory) avoids re-reading the lines.
+    """
+    rows = {
+        None: {
+            'sale_count': 1,
+            'quantity': 0,
+            'revenue': 0,
+            'total_amount': sale.total_amount,
+        }
+    }
+    if items is not None:
+        for item in items:
+            row = rows.setdefault(item.product_id, {
+                'sale_count': 1, 'quantity': 0, 'revenue': 0, 'total_amount': 0,
+            })
+            row['quantity'] += item.quantity
+            row['revenue'] += item.quantity * item.unit_price
+        return rows
+    items = SaleItem.objects.filter(sale=sale).values('product_id').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('unit_price'))
+    ).order_by()
+    for item in items:
+        rows[item['product_id']] = {
+            'sale_count': 1,
+            'quantity': item['total_quantity'] or 0,
+            'revenue': item['total_revenue'] or 0,
+            'total_amount': 0,
+        }
+    return rows
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add measures to rollup buckets, creating the missing ones.
+    deltas: {(day, product_id, customer_id, status): {measure: value}}
+    """
+    if not deltas:
+        return
+    product_ids = {key[1] for key in deltas if key[1] is not None}
+    buckets = SalesDailyRollup.objects.filter(
+        day__in={key[0] for key in deltas},
+        status__in={key[3] for key in deltas},
+    ).filter(
+        Q(product__isnull=True) | Q(product_id__in=product_ids)
+    )
+    with transaction.atomic():
+        existing = {}
+        for bucket in buckets:
+            existing.setdefault((bucket.day, bucket.product_id, bucket.customer_id, bucket.status), bucket)
+        to_update = []
+        to_create = []
+        for key, measures in deltas.items():
+            bucket = existing.get(key)
+            if bucket is None:
+                if measures['sale_count'] <= 0:
+                    continue
+                day, product_id, customer_id, status = key
+                to_create.append(SalesDailyRollup(
+                    day=day, product_id=product_id, customer_id=customer_id, status=status, **measures
+                ))
+            else:
+                for field, value in measures.items():
+                    setattr(bucket, field, F(field) + value)
+                to_update.append(bucket)
+        if to_update:
+            SalesDailyRollup.objects.bulk_update(to_update, ROLLUP_MEASURES)
+            # A bucket left without sales (sale edited or deleted) would show up as
+            # an empty row in the reports
+            SalesDailyRollup.objects.filter(pk__in=[bucket.pk for bucket in to_update], sale_count__lte=0).delete()
+        if to_create:
+            SalesDailyRollup.objects.bulk_create(to_create)
+
+
+def add_rows_to_deltas(deltas, sale, rows, sign=1, status=None):
+    day = timezone.localdate(sale.created_at)
+    status = status or sale.status
+    for product_id, measures in rows.items():
+        bucket = deltas.setdefault((day, product_id, sale.customer_id, status), dict.fromkeys(ROLLUP_MEASURES, 0))
+        for field, value in measures.items():
+            bucket[field] += sign * value
+
+
+def apply_sale_to_rollup(sale, sign=1, status=None, rows=None):
+    """Add (sign=1) or remove (sign=-1) a sale's contribution"""
+    deltas = {}
+    add_rows_to_deltas(deltas, sale, rows if rows is not None else sale_rollup_rows(sale), sign, status)
+    apply_rollup_deltas(deltas)
+
+
+def add_sale_to_rollup(sale, items=None):
+    apply_sale_to_rollup(sale, sign=1, rows=sale_rollup_rows(sale, items))
+
+
+def add_sales_to_rollup(sales_items):
+    """Add several new sales at once; sales_items is [(sale, items)]"""
+    deltas = {}
+    for sale, items in sales_items:
+        add_rows_to_deltas(deltas, sale, sale_rollup_rows(sale, items))
+    apply_rollup_deltas(deltas)
+
+
+def remove_sale_from_rollup(sale):
+    apply_sale_to_rollup(sale, sign=-1)
+
+
+def move_sale_in_rollup(sale, old_status):
+    """Move a sale's contribution after a status change"""
+    rows = sale_rollup_rows(sale)
+    deltas = {}
+    add_rows_to_deltas(deltas, sale, rows, sign=-1, status=old_status)
+    add_rows_to_deltas(deltas, sale, rows, sign=1)
+    apply_rollup_deltas(deltas)
+
+
+def bulk_create_in_batches(objs):
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, REBUILD_BATCH_SIZE))
+        if not batch:
+            break
+        SalesDailyRollup.objects.bulk_create(batch)
+
+
+def rebuild_sales_rollup():
+    """Recompute the whole rollup from Sale and SaleItem"""
+    with transaction.atomic():
+        SalesDailyRollup.objects.all().delete()
+        
+        sale_totals = Sale.objects.annotate(
+            day=TruncDate('created_at')
+        ).values('day', 'customer_id', 'status').annotate(
+            total_count=Count('id'),
+            total=Sum('total_amount')
+        ).order_by()
+        bulk_create_in_batches(
+            SalesDailyRollup(
+                day=row['day'], product_id=None, customer_id=row['customer_id'],
+                status=row['status'], sale_count=row['total_count'],
+                total_amount=row['total'] or 0
+            )
+            for row in sale_totals.iterator()
+        )
+        
+        product_totals = SaleItem.objects.annotate(
+            day=TruncDate('sale__created_at')
+        ).values('day', 'product_id', 'sale__customer_id', 'sale__status').annotate(
+            total_count=Count('sale', distinct=True),
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(F('quantity') * F('unit_price'))
+        ).order_by()
+        bulk_create_in_batches(
+            SalesDailyRollup(
+                day=row['day'], product_id=row['product_id'], customer_id=row['sale__customer_id'],
+                status=row['sale__status'], sale_count=row['total_count'],
+                quantity=row['total_quantity'] or 0, revenue=row['total_revenue'] or 0
+            )
+            for row in product_totals.iterator()
+        )
+        
+        SalesRollupState.objects.update_or_create(pk=1, defaults={'rebuilt_at': timezone.now()})
+    return SalesDailyRollup.objects.count()
@@ -1,7 +1,13 @@
+from collections import defaultdict
+from django.db import transaction
 from rest_framework import serializers
 from .models import Sale, SaleItem
+from .rollup import add_sale_to_rollup
 from products.models import Product
+from products.stock import lock_products, apply_stock_deltas
 from customers.models import Customer
+from customers.purchases import add_sale_purchase
+from changes.outbox import record_changes
 from products.serializers import ProductListSerializer
 from customers.serializers import CustomerListSerializer
 
@@ -16,10 +22,55 @@ class SaleItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'total_price']
 
 
+class PreloadedPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField served from a {pk: object} dict preloaded into the
+    serializer context under context_key, instead of one query per value.
+    """
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        objects = self.context.get(self.context_key)
+        if objects is None:
+            return super().to_internal_value(data)
+        try:
+            return objects[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+def referenced_ids(entries, field):
+    """Integer values of entries[i][field], skipping malformed ones (the field reports them)"""
+    ids = set()
+    for entry in entries if isinstance(entries, list) else []:
+        try:
+            ids.add(int(entry[field]))
+        except (TypeError, ValueError, KeyError):
+            pass
+    return ids
+
+
+class SaleItemListCreateSerializer(serializers.ListSerializer):
+    """Loads every product referenced by the items with a single query"""
+
+    def to_internal_value(self, data):
+        if 'preloaded_products' not in self.context:
+            self.context['preloaded_products'] = Product.objects.in_bulk(referenced_ids(data, 'product'))
+        return super().to_internal_value(data)
+
+
 class SaleItemCreateSerializer(serializers.ModelSerializer):
+    product = PreloadedPrimaryKeyField('preloaded_products', queryset=Product.objects.all())
+
     class Meta:
         model = SaleItem
         fields = ['product', 'quantity', 'unit_price']
+        list_serializer_class = SaleItemListCreateSerializer
 
     def validate_product(self, value):
         if not value.is_active:
@@ -65,21 +116,48 @@ class SaleCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         validated_data['created_by'] = self.context['request'].user
-        sale = Sale.objects.create(**validated_data)
         
+        # Stock needed per product, adding up lines that repeat a product
+        quantities = defaultdict(int)
         for item_data in items_data:
-            item_data['sale'] = sale
-            SaleItem.objects.create(**item_data)
-            
-            # Update stock for products
-            product = item_data['product']
-            if product.type == 'product':
-                product.stock_quantity -= item_data['quantity']
-                product.save()
+            if item_data['product'].type == 'product':
+                quantities[item_data['product'].pk] += item_data['quantity']
         
+        with transaction.atomic():
+            products = lock_products(quantities)
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                if product is None or product.stock_quantity < quantity:
+                    available = product.stock_quantity if product else 0
+                    raise serializers.ValidationError({
+                        'items': [f"Stock insuficiente para el producto {product_id}. Disponible: {available}"]
+                    })
+            
+            sale = Sale.objects.create(**validated_data)
+            # bulk_create skips SaleItem.save(), so total_price is set here
+            items = SaleItem.objects.bulk_create([
+                SaleItem(sale=sale, total_price=item_data['quantity'] * item_data['unit_price'], **item_data)
+                for item_data in items_data
+            ])
+            record_changes(SaleItem, [item.pk for item in items], 'create')
+            apply_stock_deltas({product_id: -quantity for product_id, quantity in quantities.items()})
+            add_sale_to_rollup(sale, items)
+            add_sale_purchase(sale)
         return sale
 
 
+class SaleBulkEntrySerializer(SaleCreateSerializer):
+    """One offline sale in a POST /api/sales/bulk/ batch (saved by sales.bulk)"""
+    # Declared explicitly: an existing key means "already synced", not a validation error
+    idempotency_key = serializers.CharField(max_length=100)
+    customer = PreloadedPrimaryKeyField(
+        'preloaded_customers', queryset=Customer.objects.all(), required=False, allow_null=True
+    )
+
+    class Meta(SaleCreateSerializer.Meta):
+        fields = SaleCreateSerializer.Meta.fields + ['idempotency_key']
+
+
 class SaleListSerializer(serializers.ModelSerializer):
     customer_name = serializers.CharField(source='customer.name', read_only=True)
     items_count = serializers.SerializerMethodField()
@@ -92,4 +170,7 @@ class SaleListSerializer(serializers.ModelSerializer):
         ]
 
     def get_items_count(self, obj):
+        # Annotated by SaleViewSet.get_queryset for lists
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
@@ -1,3 +1,215 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from products.models import Product
+from .models import Sale
+from .numbering import allocate_sale_numbers, release_blocks
 
-# Create your tests here.
+User = get_user_model()
+
+
+class SaleListPaginationTests(TestCase):
+    """Keyset pages over (created_at, id) stay exact when many sales share a timestamp"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cajero', password='x')
+        Sale.objects.bulk_create([
+            Sale(sale_number=f'SALE-T{i:04d}', total_amount=Decimal('1')) for i in range(40)
+        ])
+        # Bulk offline sync: most sales land on the same created_at
+        synced_at = timezone.now() - timedelta(days=1)
+        Sale.objects.filter(pk__in=Sale.objects.order_by('pk').values('pk')[5:35]).update(created_at=synced_at)
+        cls.expected = list(Sale.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('OFFSET' in query['sql'].upper() for query in queries.captured_queries))
+        self.assertFalse(any('COUNT(*)' in query['sql'].upper() for query in queries.captured_queries))
+        return response.data
+
+    def test_pages_cover_every_sale_once(self):
+        seen = []
+        url = '/api/sales/?pagination=cursor&page_size=7'
+        while url:
+            page = self.get_page(url)
+            seen += [sale['id'] for sale in page['results']]
+            url = page['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.get_page('/api/sales/?pagination=cursor&page_size=7')
+        second = self.get_page(first['next'])
+        third = self.get_page(second['next'])
+        back = self.get_page(third['previous'])
+        self.assertEqual([sale['id'] for sale in back['results']], [sale['id'] for sale in second['results']])
+        self.assertEqual(back['next'], second['next'])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/sales/?cursor=not-a-cursor').status_code, 404)
+
+    def test_next_page_seeks_the_created_at_id_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan verificado solo en SQLite')
+        page = self.get_page('/api/sales/?pagination=cursor&page_size=7')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(page['next'])
+        sql = next(query['sql'] for query in queries.captured_queries if 'FROM "sales"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertRegex(plan, r'SEARCH \w+ USING (COVERING )?INDEX sales_created_id_idx')
+
+
+class BulkSyncIdempotencyTests(TransactionTestCase):
+    """Replays of an offline batch create each sale (and take its stock) once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pos', password='x')
+        self.product = Product.objects.create(name='Café', sku='CAF-1', price=Decimal('5'), stock_quantity=10)
+
+    def entry(self, key):
+        return {
+            'idempotency_key': key, 'total_amount': '5',
+            'items': [{'product': self.product.pk, 'quantity': 1, 'unit_price': '5'}],
+        }
+
+    def sync(self, keys):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/sales/bulk/', [self.entry(key) for key in keys], format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def stock(self):
+        return Product.objects.values_list('stock_quantity', flat=True).get(pk=self.product.pk)
+
+    def test_replayed_batch_is_reported_as_duplicates(self):
+        first = self.sync(['k1', 'k2'])
+        self.assertEqual([result['status'] for result in first], ['created', 'created'])
+        replay = self.sync(['k1', 'k2'])
+        self.assertEqual([result['status'] for result in replay], ['duplicate', 'duplicate'])
+        self.assertEqual([result['id'] for result in replay], [result['id'] for result in first])
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(self.stock(), 8)
+
+    def test_key_committed_after_lookup_is_retried_as_duplicate(self):
+        existing = self.sync(['k1'])[0]
+        lookup = Sale.objects.filter
+        stale = []
+
+        def stale_lookup(*args, **kwargs):
+            # The first attempt resolves its keys before the other sync commits k1
+            if 'idempotency_key__in' in kwargs and not stale:
+                stale.append(kwargs)
+                return Sale.objects.none()
+            return lookup(*args, **kwargs)
+
+        with mock.patch.object(Sale.objects, 'filter', side_effect=stale_lookup):
+            results = self.sync(['k1', 'k2'])
+        self.assertTrue(stale)
+        self.assertEqual([result['status'] for result in results], ['duplicate', 'created'])
+        self.assertEqual(results[0]['id'], existing['id'])
+        # The failed attempt rolled back, its stock decrement included
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(self.stock(), 8)
+
+    def test_concurrent_replays_create_the_sale_once(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('SQLite no admite escrituras concurrentes')
+        barrier = threading.Barrier(2)
+        results = []
+
+        def replay():
+            try:
+                barrier.wait(10)
+                results.extend(self.sync(['k1']))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=replay) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(result['status'] for result in results), ['created', 'duplicate'])
+        self.assertEqual(len({result['id'] for result in results}), 1)
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(self.stock(), 9)
+
+
+@override_settings(SALE_NUMBER_BLOCK_SIZE=3)
+class SaleNumberingTests(TransactionTestCase):
+    """Numbers handed out from reserved blocks are unique and leave no gaps"""
+
+    def setUp(self):
+        # Blocks kept in memory belong to the database of an earlier test
+        release_blocks()
+        self.addCleanup(release_blocks)
+
+    def create_sale(self):
+        return Sale.objects.create(total_amount=Decimal('1')).sale_number
+
+    def used_numbers(self):
+        return sorted(int(number.rsplit('-', 1)[-1]) for number in Sale.objects.values_list('sale_number', flat=True))
+
+    def test_numbers_are_consecutive_across_blocks(self):
+        numbers = [self.create_sale() for _ in range(7)]
+        self.assertEqual(numbers, ['SALE-%06d' % number for number in range(1, 8)])
+        # A bulk allocation takes its own range; the rest of the open block is used afterwards
+        Sale.objects.bulk_create([
+            Sale(sale_number=number, total_amount=Decimal('1')) for number in allocate_sale_numbers(4)
+        ])
+        self.create_sale()
+        self.create_sale()
+        self.assertEqual(self.used_numbers(), list(range(1, 14)))
+
+    def test_block_reserved_in_rolled_back_transaction_is_reused(self):
+        for _ in range(3):
+            self.create_sale()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_sale()
+                raise RuntimeError('venta abortada')
+        numbers = [self.create_sale() for _ in range(3)]
+        self.assertEqual(numbers, ['SALE-000004', 'SALE-000005', 'SALE-000006'])
+        self.assertEqual(self.used_numbers(), list(range(1, 7)))
+
+    def test_concurrent_sales_get_distinct_numbers(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('SQLite no admite escrituras concurrentes')
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def cashier():
+            try:
+                barrier.wait(10)
+                for _ in range(10):
+                    self.create_sale()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=cashier) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        numbers = self.used_numbers()
+        self.assertEqual(len(numbers), 40)
+        self.assertEqual(len(set(numbers)), 40)
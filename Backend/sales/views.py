@@ -1,13 +1,25 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Sum, Count, Q
+from django.utils import timezone
 from django.db.models.query import QuerySet
-from .models import Sale
+from reports.cache import get_or_build_report, bump_data_version
+from reports.conditional import conditional_action
+from products.stock import apply_stock_deltas
+from customers.purchases import refresh_customer_purchases
+from changes.outbox import record_changes
+from .models import Sale, SaleItem
+from .rollup import add_sale_to_rollup, remove_sale_from_rollup, move_sale_in_rollup
+from .bulk import ingest_sales, MAX_BULK_SALES
+from .pagination import SaleCursorPagination
 from .serializers import (
     SaleSerializer, SaleCreateSerializer, SaleListSerializer
 )
 
+SALE_STATISTICS_CACHE_TIMEOUT = 30  # seconds; polled by the POS header widget on every terminal
+
 
 class SaleViewSet(viewsets.ModelViewSet):
     """
@@ -23,8 +35,23 @@ class SaleViewSet(viewsets.ModelViewSet):
             return SaleListSerializer
         return SaleSerializer
     
+    @property
+    def paginator(self):
+        """Cursor (keyset) pagination with ?cursor= or ?pagination=cursor, page numbers otherwise"""
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = SaleCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
     def get_queryset(self) -> QuerySet[Sale]:  # type: ignore
-        queryset = Sale.objects.all().order_by('-created_at')
+        queryset = Sale.objects.select_related('customer').order_by('-created_at', '-id')
+        if self.action == 'list':
+            queryset = queryset.annotate(items_count=Count('items'))
+        elif self.action == 'retrieve':
+            queryset = queryset.select_related('created_by').prefetch_related('items__product')
         request = getattr(self, 'request', None)
         if request:
             # Filter by status
@@ -46,43 +73,92 @@ class SaleViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(sale_date__lte=end_date)
         return queryset
     
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            old_customer_id = serializer.instance.customer_id
+            remove_sale_from_rollup(serializer.instance)
+            sale = serializer.save()
+            add_sale_to_rollup(sale)
+            refresh_customer_purchases([old_customer_id, sale.customer_id])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            remove_sale_from_rollup(instance)
+            instance.delete()
+            refresh_customer_purchases([instance.customer_id])
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Sync a batch of offline sales, identified by client idempotency keys"""
+        entries = request.data
+        if not isinstance(entries, list):
+            return Response(
+                {'error': 'Se esperaba una lista de ventas'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(entries) > MAX_BULK_SALES:
+            return Response(
+                {'error': f'Máximo {MAX_BULK_SALES} ventas por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = ingest_sales(entries, request.user, self.get_serializer_context())
+        summary = {'created': 0, 'duplicate': 0, 'error': 0}
+        for result in results:
+            summary[result['status']] += 1
+        return Response({'summary': summary, 'results': results})
+    
     @action(detail=False, methods=['get'])
+    @conditional_action(Sale)
     def statistics(self, request):
         """Get sales statistics"""
-        queryset = self.get_queryset()
-        
-        total_sales = queryset.count()
-        total_revenue = queryset.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
-        pending_sales = queryset.filter(status='pending').count()
-        completed_sales = queryset.filter(status='completed').count()
-        
-        # Monthly statistics
-        from django.utils import timezone
         current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_sales = queryset.filter(sale_date__gte=current_month)
-        monthly_revenue = monthly_sales.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
+        params = [request.query_params.get(name) for name in ('status', 'customer', 'start_date', 'end_date')]
+        
+        def build():
+            this_month = Q(sale_date__gte=current_month)
+            stats = self.get_queryset().aggregate(
+                total_sales=Count('id'),
+                total_revenue=Sum('total_amount'),
+                pending_sales=Count('id', filter=Q(status='pending')),
+                completed_sales=Count('id', filter=Q(status='completed')),
+                monthly_sales=Count('id', filter=this_month),
+                monthly_revenue=Sum('total_amount', filter=this_month),
+            )
+            stats['total_revenue'] = float(stats['total_revenue'] or 0)
+            stats['monthly_revenue'] = float(stats['monthly_revenue'] or 0)
+            return stats
         
-        return Response({
-            'total_sales': total_sales,
-            'total_revenue': float(total_revenue),
-            'pending_sales': pending_sales,
-            'completed_sales': completed_sales,
-            'monthly_sales': monthly_sales.count(),
-            'monthly_revenue': float(monthly_revenue)
-        })
+        # Cached under the report data version, which every sale write bumps
+        return Response(get_or_build_report(
+            'sale_statistics', params + [current_month.date()], build,
+            timeout=SALE_STATISTICS_CACHE_TIMEOUT
+        ))
+    
+    def change_pending_status(self, sale, new_status):
+        """
+        Move a pending sale to new_status with a conditional UPDATE, so only one of
+        several concurrent requests wins. Returns False if the sale was not pending.
+        """
+        updated = Sale.objects.filter(pk=sale.pk, status='pending').update(
+            status=new_status, updated_at=timezone.now()
+        )
+        if not updated:
+            return False
+        sale.status = new_status
+        move_sale_in_rollup(sale, old_status='pending')
+        # update() sends no post_save signal
+        record_changes(Sale, [sale.pk])
+        transaction.on_commit(bump_data_version)
+        return True
     
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         """Mark sale as completed"""
         sale = self.get_object()
-        if sale.status == 'pending':
-            sale.status = 'completed'
-            sale.save()
+        with transaction.atomic():
+            completed = self.change_pending_status(sale, 'completed')
+        if completed:
             return Response({'message': 'Venta marcada como completada'})
         return Response(
             {'error': 'Solo se pueden completar ventas pendientes'}, 
@@ -93,15 +169,16 @@ class SaleViewSet(viewsets.ModelViewSet):
     def cancel(self, request, pk=None):
         """Cancel sale and restore stock"""
         sale = self.get_object()
-        if sale.status in ['pending']:
-            # Restore stock for products
-            for item in sale.items.all():
-                if item.product.type == 'product':
-                    item.product.stock_quantity += item.quantity
-                    item.product.save()
-            
-            sale.status = 'cancelled'
-            sale.save()
+        with transaction.atomic():
+            cancelled = self.change_pending_status(sale, 'cancelled')
+            if cancelled:
+                # Restore stock with one UPDATE, quantities summed per product
+                quantities = SaleItem.objects.filter(
+                    sale=sale, product__type='product'
+                ).values('product_id').annotate(total=Sum('quantity')).order_by()
+                apply_stock_deltas({row['product_id']: row['total'] for row in quantities})
+                refresh_customer_purchases([sale.customer_id])
+        if cancelled:
             return Response({'message': 'Venta cancelada y stock restaurado'})
         return Response(
             {'error': 'Solo se pueden cancelar ventas pendientes'}, 